@@ -6,10 +6,16 @@ from analyze.cname import join_cname, join_description
 from analyze.eval.coefficients import coeff_evals
 from analyze.eval.scalar import scalar_eval
 from analyze.eval_fn import Eval, FloatArr
-from model.simulation_cpu import GENERATIONS_DTYPE
-from model.simulation_trial import Generations, SimulationTrial
-from store.dbase import db
+from env.program_env import program_env
+from model.simulation_trial import (
+    GENERATIONS_DTYPE,
+    SimulationSurvival,
+    SimulationTrial,
+)
+from store.dbase import Base
+from store.entity.danalysis_cname import column_names
 from store.entity.danalysis_datapoint import DAnalysisDatapoint
+from store.entity.danalysis_row import DAnalysisRow, analysis_schemas
 from store.entity.dparameters import DParameters
 from store.entity.drun import DRun
 
@@ -40,7 +46,7 @@ class AnalysisPipeline[R]:
         for fn in out_fn:
             fn.prepend(cname, desc)
 
-    def eval(self, run: DRun, sess, arr: FloatArr) -> List[DAnalysisDatapoint]:
+    def eval(self, run: DRun, arr: FloatArr) -> List[DAnalysisDatapoint]:
         data = arr
         for fn in self.fns:
             data = fn.calc(data)
@@ -49,8 +55,7 @@ class AnalysisPipeline[R]:
 
         for fn in self.out_fns:
             val = fn.calc(data)
-            dcname = fn.get_dcname(sess)
-            cols.append(DAnalysisDatapoint(run, dcname, val))
+            cols.append(DAnalysisDatapoint(run, fn.get_cname_id(), val))
         return cols
 
 
@@ -78,12 +83,15 @@ class DataAnalysis:
     def __pipeline(self, fn: List[Eval[FloatArr]]) -> AnalysisPipeline:
         return AnalysisPipeline(self.cname, scalar_eval(), *fn, desc=self.desc)
 
-    def eval(self, run: DRun, sess, data) -> List[DAnalysisDatapoint]:
+    def eval(self, run: DRun, data) -> List[DAnalysisDatapoint]:
         cols = []
         for pipeline in self.pipelines:
-            cols.extend(pipeline.eval(run, sess, data))
+            cols.extend(pipeline.eval(run, data))
         return cols
 
+    def out_fns(self) -> List[Eval]:
+        return [fn for pipeline in self.pipelines for fn in pipeline.out_fns]
+
 
 survival_days = DataAnalysis(
     "survival_days",
@@ -106,20 +114,34 @@ coefficients = DataAnalysis(
 )
 
 
+def resolve_column_ids(analyses: List[DataAnalysis]) -> None:
+    """Gets the column of every analysis at once, creating the new ones together"""
+    fns = [fn for analysis in analyses for fn in analysis.out_fns()]
+    fns = [fn for fn in fns if fn.cname_id is None]
+    if not fns:
+        return
+    ids = column_names.get_ids([(fn.cname, fn.description) for fn in fns])
+    for fn, id in zip(fns, ids):
+        fn.cname_id = id
+
+
 def analyze_trial(
     dparameters: DParameters,
     drun: DRun,
     trial: SimulationTrial,
-    generations: Generations,
-) -> None:
+    survival: SimulationSurvival,
+) -> List[Base]:
+    """
+    The analysis rows of a run, to be saved with it. Computed before the run is saved,
+    as any new column names are saved by their own transaction
+    """
     # TODO use multiple timesteps (rather than just t=0) in a simulation
 
-    if np.any(generations == -1):
+    if survival.went_to_infinity():
         print("Failed ecosystem. Population to infinity")
-        return
+        return []
 
-    survival_days_data = np.array(generations != 0)
-    survival_days_data = survival_days_data.sum(axis=1, dtype=GENERATIONS_DTYPE)
+    survival_days_data = survival.alive_generations.astype(GENERATIONS_DTYPE)
     survival_days_data *= trial.accuracy.euler_step
 
     analysis: List[Tuple[DataAnalysis, FloatArr]] = [
@@ -132,14 +154,14 @@ def analyze_trial(
     for analyze, data in analysis:
         if not np.any(data):
             print("data has len of 0")
-            return
+            return []
 
-    with db.sess() as sess:
-        sess.add(drun)
-        cols = trial.settings.as_columns(drun)
-        sess.add_all(cols)
+    resolve_column_ids([analyze for analyze, _ in analysis])
+    cols = trial.settings.as_columns(drun)
+    for analyze, data in analysis:
+        cols.extend(analyze.eval(drun, data))
 
-        for analyze, data in analysis:
-            cols = analyze.eval(drun, sess, data)
-            sess.add_all(cols)
-        sess.commit()
+    if program_env.run.analysis_layout == "row":
+        schema_id = analysis_schemas.get_id(tuple(col.cname_id for col in cols))
+        return [DAnalysisRow(drun, schema_id, [col.value for col in cols])]
+    return cols
@@ -1,18 +1,19 @@
 from random import Random
-from typing import List, override
+from typing import Callable, List, Tuple, override
 from uuid import UUID
 
-from networkx import Graph
-
+from config.network_attributes import LEGACY_GENERATION_ALGORITHM
 from env.program_env import program_env
+from model.simulation_trial import SimulationPopulations
 from util.random_util import RandomMeshVariables
+from util.seed import LEGACY_RANDOM_ALGORITHM
 
 
 class SimulationEpochsConfig:
     epochs: int
     iterations: int
     threads: int
-    """The number of CPU threads to use"""
+    """The number of CPU threads, or worker processes, to use"""
 
     def __init__(
         self,
@@ -31,6 +32,12 @@ class SimulationAccuracyConfig(RandomMeshVariables):
     max_extinct_if_below: float
     generate_count: int
     max_time: int
+    steady_state_tolerance: float
+    """See SimulationAccuracy.steady_state_tolerance"""
+    integrator: str
+    """See SimulationAccuracy.integrator"""
+    adaptive_rtol: float
+    adaptive_atol: float
 
     def __init__(self) -> None:
         self.generate_count = 3
@@ -39,6 +46,10 @@ class SimulationAccuracyConfig(RandomMeshVariables):
         self.min_extinct_if_below = 1e-8
         self.max_extinct_if_below = 1e-12
         self.max_time = 3000
+        self.steady_state_tolerance = 0.0
+        self.integrator = "euler"
+        self.adaptive_rtol = 1e-6
+        self.adaptive_atol = 1e-12
 
     def get_max_time(self) -> int:
         return self.max_time
@@ -62,11 +73,21 @@ class BaseProgramParameters(RandomMeshVariables):
     accuracy: SimulationAccuracyConfig
     epochs: SimulationEpochsConfig
     generate_count: int
+    generation_algorithm: int
+    """
+    How network attributes are drawn from the seed, see config.network_attributes.
+    LEGACY_GENERATION_ALGORITHM by default, so existing configs and seeds reproduce
+    their networks. VECTORIZED_GENERATION_ALGORITHM is faster, but draws other networks
+    """
+    random_algorithm: int
+    """How each series is seeded from the master seed, see util.seed"""
 
     def __init__(self, typeName: str, typeId: str, generate_count=3) -> None:
         self.typeName = typeName
         self.typeId = UUID(typeId)
         self.generate_count = generate_count
+        self.generation_algorithm = LEGACY_GENERATION_ALGORITHM
+        self.random_algorithm = LEGACY_RANDOM_ALGORITHM
 
     @override
     def gen_count(self) -> int:
@@ -84,5 +105,8 @@ class BaseProgramParameters(RandomMeshVariables):
         """
         return None
 
-    def generate_networks(self, random: Random) -> List[Graph]:
+    def generate_networks(
+        self, network_random: Callable[[int], Random]
+    ) -> List[Tuple[SimulationPopulations, object]]:
+        """Generates each network of a series from network_random(its index)"""
         raise NotImplementedError("Not Implemented!")
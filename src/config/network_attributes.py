@@ -0,0 +1,92 @@
+from random import Random
+
+import numpy as np
+
+from config.network_topology import NetworkEdges
+from model.simulation_trial import SimulationPopulations, SparseCoefficients
+from util.random_util import random_int
+
+LEGACY_GENERATION_ALGORITHM = 1
+"""Builds a networkx graph and assigns its attributes one at a time from the python Random"""
+VECTORIZED_GENERATION_ALGORITHM = 2
+"""Builds the network as arrays, and assigns its attributes together from a numpy Generator"""
+
+
+def network_populations(
+    edges: NetworkEdges, random: Random, settings
+) -> SimulationPopulations:
+    """
+    Draws the weight of every edge, and the population and growth rate of every species,
+    with the same rules as the legacy generation algorithm.
+    The relationships in 'edges' must already be two way.
+
+    'settings' is any trial settings with percent_predator, population_range,
+    min_growth_rate and max_growth_rate
+    """
+    rng = np.random.default_rng(random_int(random))
+    species_count = edges.species_count
+    src, dst = edges.src, edges.dst
+
+    # Edge Attributes
+    # Both directions of a relationship share a draw, so one side is always the predator
+    lower = np.minimum(src, dst)
+    upper = np.maximum(src, dst)
+    _, pair = np.unique(lower * species_count + upper, return_inverse=True)
+    is_predator = rng.random(pair.max(initial=-1) + 1) < settings.percent_predator
+    is_predator = is_predator[pair]
+    if edges.directed:
+        is_predator = is_predator == (src <= dst)
+    weights = rng.random(edges.edge_count()) * np.where(
+        is_predator, settings.min_growth_rate, settings.max_growth_rate
+    )
+
+    # Every relationship counts towards both of its species when they are undirected
+    if not edges.directed:
+        src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+        weights = np.concatenate((weights, weights))
+    predatorness = np.bincount(
+        src, weights=np.maximum(weights, 0), minlength=species_count
+    )
+    preyness = -np.bincount(
+        src, weights=np.minimum(weights, 0), minlength=species_count
+    )
+
+    # Node Attributes
+    populations = [
+        settings.population_range.generate(random) for _ in range(species_count)
+    ]
+    # bincount gives integers when there are no edges
+    difference = (predatorness - preyness).astype(np.float64)
+    is_tie = difference == 0
+    difference[is_tie] = np.where(rng.random(np.count_nonzero(is_tie)) < 0.5, 1, -1)
+    difference[is_tie] *= 1e-30
+    max_predatorness = max(difference.max(initial=0), 1e-30)
+    max_preyness = max(-difference.min(initial=0), 1e-30)
+
+    growth_rate = np.where(
+        difference > 0, settings.min_growth_rate, settings.max_growth_rate
+    )
+    percent = np.where(
+        difference > 0, difference / max_predatorness, -difference / max_preyness
+    )
+    means = growth_rate * percent
+    sigmas = np.minimum(np.abs(growth_rate - means), np.abs(means))
+
+    # Redraw every growth rate that is on the other side of zero from its mean
+    growth_rates = rng.normal(means, sigmas)
+    redraw = np.sign(growth_rates) != np.sign(means)
+    while np.any(redraw):
+        growth_rates[redraw] = rng.normal(means[redraw], sigmas[redraw])
+        redraw = np.sign(growth_rates) != np.sign(means)
+
+    # A species' own edge is its growth rate rather than a coefficient
+    is_coefficient = np.logical_and(src != dst, weights != 0)
+    sparse_coefficients = SparseCoefficients(
+        src[is_coefficient], dst[is_coefficient], weights[is_coefficient], species_count
+    )
+    return SimulationPopulations(
+        np.array(populations, dtype=np.float64),
+        growth_rates,
+        None,
+        sparse_coefficients,
+    )
@@ -0,0 +1,147 @@
+from itertools import product
+from random import Random
+from typing import List
+
+import numpy as np
+
+
+class NetworkEdges:
+    """
+    The relationships of a network as arrays of species indexes, without any weights.
+    Species are numbered in the order networkx would have added them to its graph,
+    and edges are in the order networkx would iterate them
+    """
+
+    species_count: int
+    src: np.ndarray[int]
+    dst: np.ndarray[int]
+    directed: bool
+    """If each edge only goes from src to dst, otherwise it goes both ways"""
+
+    def __init__(self, species_count: int, src, dst, directed: bool) -> None:
+        self.species_count = species_count
+        self.src = np.asarray(src, dtype=np.int64)
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.directed = directed
+
+    def edge_count(self) -> int:
+        return len(self.src)
+
+
+def powerlaw_cluster_edges(n: int, m: int, p: float, seed: int) -> NetworkEdges:
+    """
+    Same network as networkx.powerlaw_cluster_graph(n, m, p, seed), drawn from the same
+    random numbers, but kept as adjacency lists rather than a Graph
+    """
+    if m < 1 or n < m:
+        raise ValueError(f"Powerlaw networks must have m>1 and m<n, m={m},n={n}")
+    if p > 1 or p < 0:
+        raise ValueError(f"Powerlaw networks must have p in [0,1], p={p}")
+
+    random = Random(seed)
+    neighbors: List[List[int]] = [[] for _ in range(n)]
+    """Neighbors of each species in the order they were linked"""
+    linked = [set() for _ in range(n)]
+
+    def add_edge(u: int, v: int) -> None:
+        if v not in linked[u]:
+            linked[u].add(v)
+            linked[v].add(u)
+            neighbors[u].append(v)
+            neighbors[v].append(u)
+
+    # Each species is repeated once for each of its edges, to sample by degree
+    repeated_nodes = list(range(m))
+    for source in range(m, n):
+        possible_targets = set()
+        while len(possible_targets) < m:
+            possible_targets.add(random.choice(repeated_nodes))
+        target = possible_targets.pop()
+        add_edge(source, target)
+        repeated_nodes.append(target)
+        count = 1
+        while count < m:
+            if random.random() < p:
+                # Clustering step: make a triangle with a neighbor of the target
+                neighborhood = [
+                    nbr
+                    for nbr in neighbors[target]
+                    if nbr not in linked[source] and nbr != source
+                ]
+                if neighborhood:
+                    nbr = random.choice(neighborhood)
+                    add_edge(source, nbr)
+                    repeated_nodes.append(nbr)
+                    count += 1
+                    continue
+            target = possible_targets.pop()
+            add_edge(source, target)
+            repeated_nodes.append(target)
+            count += 1
+        repeated_nodes.extend([source] * m)
+
+    src, dst = [], []
+    for u in range(n):
+        for v in neighbors[u]:
+            if v >= u:
+                src.append(u)
+                dst.append(v)
+    return NetworkEdges(n, src, dst, directed=False)
+
+
+def navigable_small_world_edges(
+    n: int, seed: int, dim: int = 2, p: int = 1, q: int = 1, r: float = 2
+) -> NetworkEdges:
+    """
+    Same network as networkx.navigable_small_world_graph(n, p, q, r, dim, seed) after
+    every one way relationship is given its reverse, drawn from the same random numbers
+    """
+    random = Random(seed)
+    lattice = list(product(range(n), repeat=dim))
+    coordinates = np.array(lattice, dtype=np.int64).reshape(len(lattice), dim)
+    # Looked up rather than calculated with numpy, to match the float rounding of networkx
+    max_distance = dim * (n - 1)
+    probability = np.array([0.0] + [d**-r for d in range(1, max_distance + 1)])
+
+    species_of = [-1] * len(lattice)
+    successors: List[List[int]] = []
+    linked: List[set] = []
+
+    def species(point: int) -> int:
+        if species_of[point] == -1:
+            species_of[point] = len(successors)
+            successors.append([])
+            linked.append(set())
+        return species_of[point]
+
+    def add_edge(point1: int, point2: int) -> None:
+        u = species(point1)
+        v = species(point2)
+        if v not in linked[u]:
+            linked[u].add(v)
+            successors[u].append(v)
+
+    others = np.ones(len(lattice), dtype=bool)
+    for point1 in range(len(lattice)):
+        distances = np.abs(coordinates - coordinates[point1]).sum(axis=1)
+        others[point1] = False
+        for point2 in np.flatnonzero(np.logical_and(others, distances <= p)):
+            add_edge(point1, point2)
+        cdf = np.cumsum(np.concatenate(([0.0], probability[distances[others]])))
+        others[point1] = True
+        for _ in range(q):
+            point2 = np.searchsorted(cdf, random.uniform(0, float(cdf[-1])))
+            add_edge(point1, point2)
+
+    # Give every one way relationship its reverse
+    for u in range(len(successors)):
+        for v in list(successors[u]):
+            if u not in linked[v]:
+                linked[v].add(u)
+                successors[v].append(u)
+
+    src, dst = [], []
+    for u, nbrs in enumerate(successors):
+        src.extend([u] * len(nbrs))
+        dst.extend(nbrs)
+    return NetworkEdges(len(successors), src, dst, directed=True)
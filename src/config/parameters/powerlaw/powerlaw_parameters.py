@@ -1,17 +1,22 @@
 from random import Random
-from typing import List, Tuple, override
+from typing import Callable, List, Tuple, override
 
 import numpy as np
-from networkx import Graph, powerlaw_cluster_graph
 
 from config.base_parameters import (
     BaseProgramParameters,
     SimulationAccuracyConfig,
     SimulationEpochsConfig,
 )
+from config.network_attributes import (
+    VECTORIZED_GENERATION_ALGORITHM,
+    network_populations,
+)
+from config.network_topology import powerlaw_cluster_edges
 from config.parameters.powerlaw.powerlaw_trial_settings import PowerLawSettings
 from config.settings_factor import FactorConstant, FactorGenerator, FactorRangeInt
 from config.settings_generator import FactorRangeFloat, SettingsGenerator
+from model.simulation_trial import SimulationPopulations
 from util.random_util import random_int
 
 
@@ -57,7 +62,26 @@ class PowerLawParameters(BaseProgramParameters):
         self.accuracy = SimulationAccuracyConfig()
         self.epochs = SimulationEpochsConfig()
 
-    def _generate_network(self, random: Random, settings: PowerLawSettings) -> Graph:
+    def _generate_network(
+        self, random: Random, settings: PowerLawSettings
+    ) -> SimulationPopulations:
+        if self.generation_algorithm == VECTORIZED_GENERATION_ALGORITHM:
+            edges = powerlaw_cluster_edges(
+                settings.species_count,
+                m=settings.connection_m,
+                p=settings.connection_p,
+                seed=random_int(random),
+            )
+            return network_populations(edges, random, settings)
+        return self._generate_legacy_network(random, settings)
+
+    def _generate_legacy_network(
+        self, random: Random, settings: PowerLawSettings
+    ) -> SimulationPopulations:
+        from networkx import Graph, powerlaw_cluster_graph
+
+        from model.graph_util import graph_to_matrix
+
         G: Graph = powerlaw_cluster_graph(
             settings.species_count,
             m=settings.connection_m,
@@ -139,12 +163,15 @@ class PowerLawParameters(BaseProgramParameters):
             # print(f"mean {mean:0.5f} | sigma {sigma:.5f} = weight {weight:.5f}")
             self_edge["weight"] = weight
 
-        return G
+        return graph_to_matrix(G)
 
     @override
-    def generate_networks(self, random: Random) -> List[Tuple[Graph, object]]:
+    def generate_networks(
+        self, network_random: Callable[[int], Random]
+    ) -> List[Tuple[SimulationPopulations, object]]:
         networks = []
         for i in range(self.gen_count()):
+            random = network_random(i)
             chosen_settings: List[FactorGenerator] = [
                 self.species_count,
                 self.connection_m_perc,
@@ -159,6 +186,6 @@ class PowerLawParameters(BaseProgramParameters):
             chosen_settings = [sett.generate(random) for sett in chosen_settings]
             chosen_settings = PowerLawSettings(*chosen_settings)
 
-            graph: Graph = self._generate_network(random, chosen_settings)
-            networks.append((graph, chosen_settings))
+            populations = self._generate_network(random, chosen_settings)
+            networks.append((populations, chosen_settings))
         return networks
@@ -1,17 +1,22 @@
 from random import Random
-from typing import List, Tuple, override
+from typing import Callable, List, Tuple, override
 
 import numpy as np
-from networkx import Graph, navigable_small_world_graph
 
 from config.base_parameters import (
     BaseProgramParameters,
     SimulationAccuracyConfig,
     SimulationEpochsConfig,
 )
+from config.network_attributes import (
+    VECTORIZED_GENERATION_ALGORITHM,
+    network_populations,
+)
+from config.network_topology import navigable_small_world_edges
 from config.parameters.small_world.small_world_trial_settings import SmallWorldSettings
 from config.settings_factor import FactorConstant, FactorGenerator, FactorRangeInt
 from config.settings_generator import FactorRangeFloat, SettingsGenerator
+from model.simulation_trial import SimulationPopulations
 from util.random_util import random_int
 
 
@@ -55,7 +60,25 @@ class SmallWorldParameters(BaseProgramParameters):
         self.accuracy = SimulationAccuracyConfig()
         self.epochs = SimulationEpochsConfig()
 
-    def _generate_network(self, random: Random, settings: SmallWorldSettings) -> Graph:
+    def _generate_network(
+        self, random: Random, settings: SmallWorldSettings
+    ) -> SimulationPopulations:
+        if self.generation_algorithm == VECTORIZED_GENERATION_ALGORITHM:
+            edges = navigable_small_world_edges(
+                settings.network_side_length,
+                seed=random_int(random),
+                dim=settings.network_dim,
+            )
+            return network_populations(edges, random, settings)
+        return self._generate_legacy_network(random, settings)
+
+    def _generate_legacy_network(
+        self, random: Random, settings: SmallWorldSettings
+    ) -> SimulationPopulations:
+        from networkx import Graph, navigable_small_world_graph
+
+        from model.graph_util import graph_to_matrix
+
         G: Graph = navigable_small_world_graph(
             settings.network_side_length,
             seed=random_int(random),
@@ -136,12 +159,15 @@ class SmallWorldParameters(BaseProgramParameters):
             # print(f"mean {mean:0.5f} | sigma {sigma:.5f} = weight {weight:.5f}")
             self_edge["weight"] = weight
 
-        return G
+        return graph_to_matrix(G)
 
     @override
-    def generate_networks(self, random: Random) -> List[Tuple[Graph, object]]:
+    def generate_networks(
+        self, network_random: Callable[[int], Random]
+    ) -> List[Tuple[SimulationPopulations, object]]:
         networks = []
         for i in range(self.gen_count()):
+            random = network_random(i)
             chosen_settings: List[FactorGenerator] = [
                 self.network_dim,
                 self.network_side_length,
@@ -155,6 +181,6 @@ class SmallWorldParameters(BaseProgramParameters):
             chosen_settings = [sett.generate(random) for sett in chosen_settings]
             chosen_settings = SmallWorldSettings(*chosen_settings)
 
-            graph: Graph = self._generate_network(random, chosen_settings)
-            networks.append((graph, chosen_settings))
+            populations = self._generate_network(random, chosen_settings)
+            networks.append((populations, chosen_settings))
         return networks
@@ -1,7 +1,7 @@
 from typing import List
 
 from config.settings_factor import FactorGenerator
-from store.entity.danalysis_cname import get_column
+from store.entity.danalysis_cname import get_column_id
 from store.entity.danalysis_datapoint import DAnalysisDatapoint
 from store.entity.drun import DRun
 
@@ -58,7 +58,7 @@ class SmallWorldSettings:
         datapoints = []
         for cname in constant_cols:
             col = self.__dict__[cname]
-            datapoints.append(DAnalysisDatapoint(run, get_column(cname), col)),
+            datapoints.append(DAnalysisDatapoint(run, get_column_id(cname), col)),
         for cname in variable_cols:
             col = self.__dict__[cname]
             datapoints.extend(col.as_columns(run, cname))
@@ -1,14 +1,14 @@
 from abc import abstractmethod
 from random import Random
+from typing import Callable, List, Tuple
 from uuid import UUID
 
-from networkx import Graph
-
 from config.base_parameters import (
     BaseProgramParameters,
     SimulationAccuracyConfig,
     SimulationEpochsConfig,
 )
+from model.simulation_trial import SimulationPopulations
 from util.seed import Seed
 
 
@@ -36,6 +36,8 @@ class ProgramParametersApi:
         return self.master_seed
 
     @abstractmethod
-    def generate_networks(self, random: Random) -> Graph:
+    def generate_networks(
+        self, network_random: Callable[[int], Random]
+    ) -> List[Tuple[SimulationPopulations, object]]:
         # Should be implemented in base. Not here
-        return self.base.generate_networks(random)
+        return self.base.generate_networks(network_random)
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from random import Random
 from typing import List, override
 
-from store.entity.danalysis_cname import get_column
+from store.entity.danalysis_cname import get_column_id
 from store.entity.danalysis_datapoint import DAnalysisDatapoint
 from store.entity.drun import DRun
 
@@ -37,8 +37,8 @@ class FactorRangeFloat(FactorGenerator[float]):
 
     @override
     def as_columns(self, run: DRun, prefix: str) -> List[DAnalysisDatapoint]:
-        min_val_col = get_column(f"{prefix}.range(min)")
-        max_val_col = get_column(f"{prefix}.range(max)")
+        min_val_col = get_column_id(f"{prefix}.range(min)")
+        max_val_col = get_column_id(f"{prefix}.range(max)")
         return [
             DAnalysisDatapoint(run, min_val_col, self.min_val),
             DAnalysisDatapoint(run, max_val_col, self.max_val),
@@ -62,8 +62,8 @@ class FactorRangeInt(FactorGenerator[int]):
 
     @override
     def as_columns(self, run: DRun, prefix: str) -> List[DAnalysisDatapoint]:
-        min_val_col = get_column(f"{prefix}.range(min)")
-        max_val_col = get_column(f"{prefix}.range(max)")
+        min_val_col = get_column_id(f"{prefix}.range(min)")
+        max_val_col = get_column_id(f"{prefix}.range(max)")
         return [
             DAnalysisDatapoint(run, min_val_col, self.min_val),
             DAnalysisDatapoint(run, max_val_col, self.max_val),
@@ -82,5 +82,5 @@ class FactorConstant[R](FactorGenerator[R]):
 
     @override
     def as_columns(self, run: DRun, prefix: str) -> List[DAnalysisDatapoint]:
-        col = get_column(f"{prefix}.val")
+        col = get_column_id(f"{prefix}.val")
         return [DAnalysisDatapoint(run, col, self.val)]
@@ -14,6 +14,14 @@ class ProgramEnvConn(ABC):
     def is_default(self) -> bool:
         raise Exception
 
+    def on_connect(self, dbapi_connection) -> None:
+        """Called with each new connection the engine opens"""
+        pass
+
+    def is_single_writer(self) -> bool:
+        """If trials should be saved by one writer, grouping them into each commit"""
+        return False
+
 
 class ProgramEnvPostgresConn(ProgramEnvConn):
     username: str
@@ -57,11 +65,27 @@ class ProgramEnvSQLiteConn(ProgramEnvConn):
     filepath: str
     driver: str
     user_verified_configuration: bool
+    single_writer: bool
+    """Save trials from one thread, committing every trial waiting together"""
+    journal_mode: str
+    """WAL lets readers continue while a trial is being written"""
+    synchronous: str
+    """NORMAL only syncs at WAL checkpoints, so a power loss can lose recent commits"""
+    cache_size_kib: int
+    mmap_size_bytes: int
+    busy_timeout_ms: int
+    """How long to wait for another connection's write before failing"""
 
     def __init__(self) -> None:
         self.filepath = "./run/lotka_db.sqlite"
         self.driver = "sqlite+pysqlite"
         self.user_verified_configuration = False
+        self.single_writer = True
+        self.journal_mode = "WAL"
+        self.synchronous = "NORMAL"
+        self.cache_size_kib = 64 * 1024
+        self.mmap_size_bytes = 256 * 1024**2
+        self.busy_timeout_ms = 30_000
 
     @override
     def url(self) -> URL:
@@ -73,3 +97,18 @@ class ProgramEnvSQLiteConn(ProgramEnvConn):
     @override
     def is_default(self) -> bool:
         return self.user_verified_configuration
+
+    @override
+    def on_connect(self, dbapi_connection) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={self.synchronous}")
+        # Negative sizes are in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size={int(self.mmap_size_bytes)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        cursor.close()
+
+    @override
+    def is_single_writer(self) -> bool:
+        return self.single_writer
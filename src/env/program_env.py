@@ -1,6 +1,6 @@
 import json
 import sys
-from os import cpu_count, path
+from os import cpu_count, environ, path
 from types import SimpleNamespace
 from typing import List, Optional, override
 from uuid import UUID, uuid4
@@ -21,12 +21,109 @@ class ProgramEnvRun(ConfigInit):
     master_seed: Optional[str]
     series_id: List[SimulationSeriesId] | Optional[SimulationSeriesId]
     thread_count: int
+    executor: str
+    """How ExecuteEpochs runs each series in parallel. One of 'thread', 'process'"""
+    prefetch_depth: int
+    """
+    How many upcoming series have their trials generated ahead of the threads that
+    simulate them. 0 generates each series in the thread that simulates it.
+    Only used by the 'thread' executor
+    """
+    scheduling: str
+    """
+    How the 'thread' executor orders the trials it runs. One of 'series', 'longest_first'.
+    'series' runs each series on one thread, its trials in the order they were generated.
+    'longest_first' runs the trials of the next few series across every thread, the
+    most expensive first, so an epoch doesn't end with one thread running a large trial
+    """
+    scheduling_window: int
+    """How many series have their trials scheduled together by 'longest_first'"""
+    engine: str
+    """
+    Which simulation engine to use.
+    One of 'auto', 'autotune', 'cpu', 'jit', 'sparse', 'batched', 'gpu'.
+    'auto' uses the gpu if there is one, otherwise 'jit'. 'autotune' uses whichever
+    engine is predicted to be fastest for each trial, or the batched engine for a series
+    predicted to be faster as one padded batch. The prediction is calibrated the first
+    time a machine runs a trial, and cached in 'calibration_file'
+    """
+    calibration_file: str
+    """Where the timings used to predict the fastest engine are cached"""
+    batch_trials: bool
+    """Step all trials of a series together as one batch on the CPU"""
+    series_source: str
+    """
+    Where ExecuteEpochs gets the series it runs. One of 'local', 'lease'.
+    'local' runs every series itself, 'lease' claims epochs from a table in the database,
+    so workers on many hosts with the same master_seed and parameters share the run
+    """
+    lease_timeout_seconds: float
+    """How long a worker can go without a heartbeat before its epochs are claimed again"""
+    lease_heartbeat_seconds: float
+    """How often a worker shows it is alive for the epochs it holds"""
+    resume: bool
+    """
+    Continue the last run with the same master seed and parameters, skipping every
+    series it already saved. Requires master_seed to be set
+    """
+    save_threads: int
+    """How many threads write trials to the database"""
+    save_max_pending_trials: int
+    """Simulation waits once this many trials are waiting to be saved"""
+    save_max_pending_bytes: int
+    """Simulation waits once the arrays of the trials waiting to be saved are this large"""
+    result_sink: bool
+    """
+    Buffer the rows of many trials and save them together in one transaction, rather
+    than each trial in its own. Limited by 'save_max_pending_trials' rather than bytes
+    """
+    result_sink_flush_trials: int
+    """The result sink saves its trials once this many are buffered"""
+    result_sink_flush_seconds: float
+    """The result sink saves its trials once the oldest has been buffered this long"""
+    analysis_layout: str
+    """
+    How the analysis of each run is saved. One of 'datapoints', 'row'.
+    'datapoints' saves a row for each value, 'row' packs every value of a run into one
+    row, in the column order saved in 'analysis_schema'
+    """
+    coefficient_layout: str
+    """
+    How the coefficients of each run are saved. One of 'rows', 'blob'.
+    'rows' saves a row in 'coefficients' for each pair of species that interact,
+    'blob' saves every coefficient of a run as one compressed row in 'coefficients_blob'
+    """
+    network_cache_dir: Optional[str]
+    """Where generated networks are cached to be reused by later runs, None to not cache"""
+    network_cache_max_bytes: int
+    """Least recently used networks are removed once the cache is larger than this"""
 
     def __init__(self) -> None:
         self.last_seed_used = []
         self.master_seed = None
         self.series_id = None
         self.thread_count = 1
+        self.executor = "thread"
+        self.prefetch_depth = 2
+        self.scheduling = "longest_first"
+        self.scheduling_window = 2
+        self.engine = "auto"
+        self.calibration_file = "./run/engine_calibration.json"
+        self.batch_trials = False
+        self.series_source = "local"
+        self.lease_timeout_seconds = 120.0
+        self.lease_heartbeat_seconds = 30.0
+        self.resume = False
+        self.save_threads = 2
+        self.save_max_pending_trials = 64
+        self.save_max_pending_bytes = 512 * 1024**2
+        self.result_sink = False
+        self.result_sink_flush_trials = 32
+        self.result_sink_flush_seconds = 2.0
+        self.analysis_layout = "datapoints"
+        self.coefficient_layout = "rows"
+        self.network_cache_dir = None
+        self.network_cache_max_bytes = 4 * 1024**3
 
     def get_thread_count(self) -> int:
         if self.thread_count > 0:
@@ -90,6 +187,18 @@ class ProgramEnv:
         write_file(self, program_env_file)
 
 
+READ_ONLY_ENV_VAR = "PROGRAM_ENV_READ_ONLY"
+"""
+Set in the environment of worker processes, which import this module again. Checking
+parent_process() isn't enough, as it is still None while a spawned process imports
+"""
+
+
+def mark_workers_read_only() -> None:
+    """Called before starting worker processes, which inherit the environment"""
+    environ[READ_ONLY_ENV_VAR] = "1"
+
+
 def _load_config():
     if not path.exists(program_env_file):
         write_file(ProgramEnv(), program_env_file)
@@ -108,8 +217,10 @@ def _load_config():
 
     # Save a copy of config with 'before_save_hook()' being called.
     # This is so program_env will still have 'CONFIRM_DROP_DATABASE_ONCE' as potentially True
-    # so that the initialization can follow the drop database procedure before it's reverted
-    merge_obj(ProgramEnv(), file_json).save()
+    # so that the initialization can follow the drop database procedure before it's reverted.
+    # Worker processes only read the config, so they don't race each other writing it
+    if READ_ONLY_ENV_VAR not in environ:
+        merge_obj(ProgramEnv(), file_json).save()
 
     if config.database_conn().is_default():
         print(f"Please configure {file.name}. The databaseConnection is incomplete")
@@ -1,29 +1,52 @@
 from io import TextIOWrapper
 from os import path, makedirs
-from typing import List
+from typing import Dict, List
 from uuid import UUID
 
 from sqlalchemy import distinct, select
 
 from store.entity.danalysis_cname import DAnalysisColumnName
 from store.entity.danalysis_datapoint import DAnalysisDatapoint
+from store.entity.danalysis_row import DAnalysisRow, DAnalysisSchema, unpack_values
 from store.entity.dparameters import DParameters
 from store.entity.drun import DRun
 from store.init_db import db, init_db
 
 
+def load_schemas(sess, parameter_id) -> Dict[UUID, List[UUID]]:
+    """The columns of each schema the analysis rows of 'parameter_id' are packed in"""
+    schemas_query = select(DAnalysisSchema.id, DAnalysisSchema.cname_ids).where(
+        DAnalysisSchema.id.in_(
+            select(DAnalysisRow.schema_id)
+            .join(DRun, DRun.id == DAnalysisRow.run_id)
+            .where(DRun.parameters_id == parameter_id)
+        )
+    )
+    return {
+        schema_id: [UUID(cid) for cid in cname_ids]
+        for schema_id, cname_ids in sess.execute(schemas_query).all()
+    }
+
+
 def export_parameter_runs(sess, parameter_id, file: TextIOWrapper):
+    schemas = load_schemas(sess, parameter_id)
     cnames_query = (
         select(DAnalysisColumnName.id, DAnalysisColumnName.name)
         .distinct()
         .join(DAnalysisDatapoint.cname)
         .join(DRun, DRun.id == DAnalysisDatapoint.run_id)
         .where(DRun.parameters_id == parameter_id)
-        .order_by(DAnalysisColumnName.name)
     )
-    columns: List[tuple[UUID, str]] = sess.execute(cnames_query).all()
-    cids = [col[0] for col in columns]
-    cnames = [col[1] for col in columns]
+    columns: Dict[UUID, str] = dict(sess.execute(cnames_query).all())
+    schema_cids = {cid for cids in schemas.values() for cid in cids}
+    schema_cids.difference_update(columns.keys())
+    if schema_cids:
+        schema_cnames_query = select(
+            DAnalysisColumnName.id, DAnalysisColumnName.name
+        ).where(DAnalysisColumnName.id.in_(schema_cids))
+        columns.update(sess.execute(schema_cnames_query).all())
+    cids = sorted(columns.keys(), key=lambda cid: columns[cid])
+    cnames = [columns[cid] for cid in cids]
 
     file.write("run_id,")
     file.write(",".join(cnames))
@@ -58,6 +81,26 @@ def export_parameter_runs(sess, parameter_id, file: TextIOWrapper):
         file.write(",".join(values))
         file.write("\n")
 
+    # Runs saved with one analysis row are only unpacked, rather than pivoted
+    positions = {cid: i for i, cid in enumerate(cids)}
+    schema_positions = {
+        schema_id: [positions[cid] for cid in schema_cids]
+        for schema_id, schema_cids in schemas.items()
+    }
+    analysis_rows_query = (
+        select(DAnalysisRow.run_id, DAnalysisRow.schema_id, DAnalysisRow.values)
+        .join(DRun, DRun.id == DAnalysisRow.run_id)
+        .where(DRun.parameters_id == parameter_id)
+        .order_by(DRun.id)
+    )
+    for run_id, schema_id, packed in sess.execute(analysis_rows_query).yield_per(1000):
+        values = [""] * len(cids)
+        for position, value in zip(schema_positions[schema_id], unpack_values(packed)):
+            values[position] = str(value)
+        file.write(f"'{run_id}',")
+        file.write(",".join(values))
+        file.write("\n")
+
 
 def export():
     init_db()
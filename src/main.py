@@ -1,16 +1,46 @@
 import threading
-from concurrent.futures import ThreadPoolExecutor
-from threading import Event, Lock
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from functools import partial
+from multiprocessing import get_context
+from threading import Event, RLock
 from time import time
 from traceback import print_exception
+from typing import Callable, Iterator, List, Set, Tuple
 
 from config.load_parameters import load_arguments
 from config.parameters_api import ProgramParametersApi
+from env.program_env import mark_workers_read_only, program_env
+from model.simulation import SimulationSeries
+from model.simulation_prefetch import TrialPrefetcher
+from model.simulation_schedule import TrialSchedule, estimate_trial_cost
 from model.simulation_series_id import SimulationSeriesId
-from run_simulation import run_simulation, simulation_save_executor
+from model.simulation_trial import SimulationTrial
+from run_simulation import (
+    calibrate_before_workers,
+    init_process_worker,
+    run_scheduled_trial,
+    run_simulation,
+    run_simulation_in_process,
+    simulation_result_sink,
+    simulation_save_queue,
+)
 from store.dbase import db
-from store.entity.dparameters import DParameters
+from store.entity.dparameters import DParameters, get_or_save_parameters
 from store.init_db import init_db
+from store.lease.series_leases import SeriesLeases
+from store.load.completed_series import (
+    CompletedSeries,
+    load_completed_series,
+    load_saved_series,
+)
+from util.future_util import when_all_done
+from util.iter_util import locked_tee
 
 
 def ignore(*args):
@@ -24,73 +54,339 @@ class ExecuteEpochs:
 
     def __init__(self, config: ProgramParametersApi, dparameters: DParameters) -> None:
         self.complete_event = Event()
-        self.executor = ThreadPoolExecutor(max_workers=config.epochs.threads)
+        self.exit_exception: Exception | None = None
+        self.use_processes = program_env.run.executor == "process"
+        self.executor = self.create_executor(config, dparameters)
         self.config = config
         self.dparameters = dparameters
         self.epoch = 0
         self.max_epochs = config.epochs.epochs
         self.iteration = 0
         self.max_iteration = config.epochs.iterations
+        self.trials_per_series = config.base.gen_count() * config.accuracy.gen_count()
+        self.leases = self.create_leases(dparameters)
+        # Every series is iterated while finding which were completed
+        self.completed: CompletedSeries | None = None
+        self.completed = self.load_completed(dparameters)
         self.active_tasks = 0
+        # Tasks that finished running, but whose trials aren't saved yet
+        self.unsaved = 0
         self.max_tasks = config.epochs.threads
-        self.lock = Lock()
+        # Reentrant since a process future that is already done runs its callback inline
+        self.lock = RLock()
+        self.series_ids, self.prefetcher = self.create_prefetcher(config)
+        self.schedule = self.create_schedule()
 
-    def locked_increment(self):
-        self.iteration += 1
-        if self.iteration < self.max_iteration:
-            return True
-        if self.epoch >= self.max_epochs:
-            if self.active_tasks == 0:
-                simulation_save_executor.shutdown()
-                self.complete_event.set()
-                self.executor.shutdown()
+    def create_executor(
+        self, config: ProgramParametersApi, dparameters: DParameters
+    ) -> Executor:
+        if not self.use_processes:
+            return ThreadPoolExecutor(max_workers=config.epochs.threads)
+        mark_workers_read_only()
+        calibrate_before_workers()
+        # Spawned rather than forked, as a forked CUDA context is unusable
+        return ProcessPoolExecutor(
+            max_workers=config.epochs.threads,
+            mp_context=get_context("spawn"),
+            initializer=init_process_worker,
+            initargs=(config, dparameters),
+        )
 
-            return False
+    def create_leases(self, dparameters: DParameters) -> SeriesLeases | None:
+        if program_env.run.series_source != "lease":
+            return None
+        leases = SeriesLeases(
+            dparameters,
+            program_env.run.lease_timeout_seconds,
+            program_env.run.lease_heartbeat_seconds,
+        )
+        leases.create_leases(self.epoch, self.max_epochs)
+        return leases
 
-        self.iteration = 0
-        self.epoch += 1
-        return True
+    def load_completed(self, dparameters: DParameters) -> CompletedSeries | None:
+        if self.leases is not None:
+            # Filled in for each epoch as it is claimed
+            return CompletedSeries(self.max_epochs, self.max_iteration)
+        if not program_env.run.resume:
+            return None
+        completed = load_completed_series(
+            dparameters,
+            self.iterate_series_ids(),
+            self.max_epochs,
+            self.max_iteration,
+            self.trials_per_series,
+        )
+        print(f"Resuming, skipping {completed.completed_count()} completed series")
+        return completed
+
+    def create_prefetcher(
+        self, config: ProgramParametersApi
+    ) -> Tuple[Iterator[SimulationSeriesId], TrialPrefetcher | None]:
+        """The series to submit, and the prefetcher generating them ahead of time"""
+        if self.leases is not None:
+            series_ids = self.iterate_leased_series_ids()
+        else:
+            series_ids = self.iterate_series_ids()
+        depth = program_env.run.prefetch_depth
+        if self.use_processes or depth <= 0:
+            return series_ids, None
+        # Follows the same order of series the tasks are submitted in. Shared, so
+        # each epoch is only claimed once
+        series_ids, prefetch_ids = locked_tee(series_ids)
+        return series_ids, TrialPrefetcher(config, prefetch_ids, depth)
+
+    def create_schedule(self) -> TrialSchedule | None:
+        if program_env.run.scheduling != "longest_first":
+            return None
+        # Batched trials need their whole series, and processes generate their own
+        if self.use_processes or program_env.run.batch_trials:
+            return None
+        return TrialSchedule()
+
+    def epoch_series_ids(self, epoch: int) -> List[SimulationSeriesId]:
+        """Every series of 'epoch' after the current iteration"""
+        first_iteration = self.iteration + 1 if epoch == self.epoch else 0
+        return [
+            SimulationSeriesId(epoch, iteration)
+            for iteration in range(first_iteration, self.max_iteration)
+        ]
+
+    def iterate_series_ids(self) -> Iterator[SimulationSeriesId]:
+        """Every series to run, in order, after the current epoch and iteration"""
+        for epoch in range(self.epoch, self.max_epochs + 1):
+            for series_id in self.epoch_series_ids(epoch):
+                if self.completed is not None and self.completed.is_complete(series_id):
+                    continue
+                yield series_id
 
-    def finish_task(self, ex):
+    def iterate_leased_series_ids(self) -> Iterator[SimulationSeriesId]:
+        """
+        Every series of each epoch this worker claims, until no epoch is left unclaimed.
+        Series another worker saved before its lease expired are skipped
+        """
+        while (epoch := self.leases.claim()) is not None:
+            series_ids = self.epoch_series_ids(epoch)
+            load_saved_series(
+                self.completed, self.dparameters, series_ids, self.trials_per_series
+            )
+            for series_id in series_ids:
+                if not self.completed.is_complete(series_id):
+                    self.leases.series_started(epoch)
+                    yield series_id
+            self.leases.epoch_started(epoch)
+
+    def locked_next_series(self) -> SimulationSeriesId | None:
+        series_id = next(self.series_ids, None)
+        if series_id is not None:
+            return series_id
+        self.locked_complete_if_idle()
+        return None
+
+    def locked_complete_if_idle(self):
+        if self.active_tasks > 0:
+            return
+        if self.unsaved > 0:
+            # Nothing is left to run, so the last trials needn't wait to be batched
+            if simulation_result_sink is not None:
+                simulation_result_sink.flush()
+            return
+        if self.leases is not None:
+            self.leases.stop()
+        self.complete_event.set()
+        # Called from inside the executor, so it can't wait on itself
+        self.executor.shutdown(wait=False)
+
+    def finish_task(self, series_id: SimulationSeriesId | None, ex):
+        """'series_id' is the series the task finished running, if it finished one"""
         if ex is not None:
             self.on_exception(ex)
+        elif series_id is not None and self.leases is not None:
+            self.leases.series_finished(series_id.epoch)
 
         with self.lock:
             self.active_tasks -= 1
         self.verify_full()
 
+    def finish_when_saved(
+        self, saves: List[Future], on_saved: Callable[[Exception | None], None]
+    ):
+        """
+        Frees the task's thread without waiting for its trials to be saved, but keeps the
+        run from completing until they are and on_saved has been called
+        """
+        with self.lock:
+            self.unsaved += 1
+        when_all_done(saves, on_saved)
+        self.finish_task(None, None)
+
+    def on_saved(self, series_id: SimulationSeriesId | None, ex):
+        """'series_id' is the series whose trials were all saved, if any was"""
+        if ex is not None:
+            self.on_exception(ex)
+        elif series_id is not None and self.leases is not None:
+            self.leases.series_finished(series_id.epoch)
+
+        with self.lock:
+            self.unsaved -= 1
+        self.verify_full()
+
     def run(self, series_id: SimulationSeriesId):
         """A job to run the simulation"""
         try:
-            run_simulation(self.config, self.dparameters, series_id)
+            trials = None
+            if self.prefetcher is not None:
+                trials = self.prefetcher.take(series_id)
+            saves = run_simulation(
+                self.config,
+                self.dparameters,
+                series_id,
+                trials,
+                self.get_saved_trials(series_id),
+            )
         except Exception as e:
-            self.finish_task(e)
+            self.finish_task(series_id, e)
+            return
+        if self.leases is not None:
+            # An epoch's lease is only completed once all of its series are saved
+            self.finish_when_saved(saves, partial(self.on_saved, series_id))
         else:
-            self.finish_task(None)
+            self.finish_task(series_id, None)
+
+    def generate(self, series_id: SimulationSeriesId):
+        """A job to generate the trials of a series, to be scheduled by their cost"""
+        try:
+            if self.prefetcher is not None:
+                trials = self.prefetcher.take(series_id)
+            else:
+                trials = SimulationSeries(
+                    self.config, series_id
+                ).iteration_generate_trials()
+            saved_trials = self.get_saved_trials(series_id)
+            trials = [trial for trial in trials if trial.index not in saved_trials]
+            costs = [estimate_trial_cost(trial) for trial in trials]
+        except Exception as e:
+            with self.lock:
+                self.schedule.stop_generating()
+            self.finish_task(None, e)
+            return
+        with self.lock:
+            self.schedule.add_series(series_id, trials, costs)
+        # A series with every trial already saved is finished as soon as it's generated
+        self.finish_task(None if trials else series_id, None)
+
+    def run_trial(self, trial: SimulationTrial):
+        """A job to run one trial of a scheduled series"""
+        try:
+            save = run_scheduled_trial(
+                self.config, self.dparameters, trial, self.trials_per_series
+            )
+        except Exception as e:
+            self.finish_task(None, e)
+            return
+        if self.leases is not None:
+            self.finish_when_saved([save], partial(self.on_trial_saved, trial))
+            return
+        with self.lock:
+            is_last = self.schedule.trial_finished(trial)
+        self.finish_task(trial.series_id if is_last else None, None)
+
+    def on_trial_saved(self, trial: SimulationTrial, ex):
+        series_id = None
+        if ex is None:
+            with self.lock:
+                if self.schedule.trial_finished(trial):
+                    series_id = trial.series_id
+        self.on_saved(series_id, ex)
+
+    def get_saved_trials(self, series_id: SimulationSeriesId) -> Set[int]:
+        if self.completed is None:
+            return set()
+        return self.completed.get_saved_trials(series_id)
+
+    def on_process_done(self, series_id: SimulationSeriesId, future: Future):
+        """Called in this process once a worker process has run a series"""
+        ex = future.exception()
+        if isinstance(ex, BrokenExecutor):
+            # Called by the pool while it fails every future, when it can't be shut down
+            self.on_exception(ex)
+            return
+        self.finish_task(series_id, ex)
 
     def verify_full(self):
+        if self.schedule is not None:
+            self.verify_full_scheduled()
+            return
         with self.lock:
             while self.active_tasks < self.max_tasks:
-                if not self.locked_increment():
+                series_id = self.locked_next_series()
+                if series_id is None:
                     return
                 self.active_tasks += 1
 
                 if self.complete_event.is_set():
                     # Only happens at end of program
                     return
-                series_id = SimulationSeriesId(self.epoch, self.iteration)
-                self.executor.submit(self.run, series_id)
+                if self.use_processes:
+                    try:
+                        future = self.executor.submit(
+                            run_simulation_in_process,
+                            series_id,
+                            self.get_saved_trials(series_id),
+                        )
+                    except BrokenExecutor as e:
+                        # Raised inside a done callback, where it would only be logged
+                        self.on_exception(e)
+                        return
+                    future.add_done_callback(partial(self.on_process_done, series_id))
+                else:
+                    self.executor.submit(self.run, series_id)
+
+    def verify_full_scheduled(self):
+        """Generates the next few series, and runs their costliest trials first"""
+        with self.lock:
+            while self.active_tasks < self.max_tasks:
+                if self.complete_event.is_set():
+                    return
+                if self.schedule.series_count() < program_env.run.scheduling_window:
+                    series_id = next(self.series_ids, None)
+                    if series_id is not None:
+                        self.schedule.start_generating()
+                        self.active_tasks += 1
+                        self.executor.submit(self.generate, series_id)
+                        continue
+                trial = self.schedule.pop()
+                if trial is None:
+                    # Either the trials being generated will fill it, or nothing is left
+                    self.locked_complete_if_idle()
+                    return
+                self.active_tasks += 1
+                self.executor.submit(self.run_trial, trial)
 
     def on_exception(self, ex: Exception):
-        if isinstance(ex, (SystemExit)):
+        # A broken pool won't run any more series, so the run fails rather than waits
+        if isinstance(ex, (SystemExit, BrokenExecutor)):
             self.exit_exception = ex
             self.complete_event.set()
             return
         print_exception(ex)
 
     def complete(self) -> Exception | None:
+        if self.prefetcher is not None:
+            self.prefetcher.start()
         self.verify_full()
         self.complete_event.wait()
+        # Shut down here rather than where the run completes, as that may be a thread
+        # of the save queue, which can't wait for itself
+        simulation_save_queue.shutdown()
+        if simulation_result_sink is not None:
+            # Saves whatever is still buffered, also when exiting early
+            simulation_result_sink.shutdown()
+        if not self.use_processes:
+            # Each worker process saves its own trials
+            if simulation_result_sink is not None:
+                print(f"Result sink: {simulation_result_sink.stats}")
+            else:
+                print(f"Save queue: {simulation_save_queue.stats}")
         return self.exit_exception
 
 
@@ -100,7 +396,11 @@ def main():
 
     config: ProgramParametersApi = load_arguments()
     dparameters: DParameters = DParameters(config.get_master_seed().uuid, config.base)
-    db.save(dparameters)
+    if program_env.run.resume or program_env.run.series_source == "lease":
+        # Workers sharing a run by leases all save their trials to the same parameters
+        dparameters = get_or_save_parameters(dparameters)
+    else:
+        db.save(dparameters)
 
     # No real difference between an epoch and iteration atm
     exit_type: Exception | None = ExecuteEpochs(config, dparameters).complete()
@@ -6,27 +6,41 @@ from model.simulation_trial import SimulationPopulations
 
 def graph_to_matrix(G: nx.Graph) -> SimulationPopulations:
     node_count = G.number_of_nodes()
+    node_index = {node: idx for idx, node in enumerate(G.nodes)}
     initial_populations = np.zeros(shape=(node_count))
-    data = [node for _, node in G.nodes(data=True)]
-    for idx, node in enumerate(data):
-        initial_populations[idx] = node["population"]
+    for idx, (_, population) in enumerate(G.nodes(data="population")):
+        initial_populations[idx] = population
 
     growth_rates = np.zeros(shape=(node_count))
     coefficients = np.zeros(shape=(node_count, node_count))
 
-    for idx1, node1 in enumerate(G.nodes):
-        for idx2, node2 in enumerate(G.nodes):
-            data = G.get_edge_data(u=node1, v=node2, default=None)
-            if data is None:
-                continue
-            weight = data["weight"]
-            if node1 == node2:
-                growth_rates[idx1] = weight
-            else:
-                coefficients[idx1][idx2] = weight
+    # Only visits the edges rather than every pair of nodes
+    for node1, node2, weight in G.edges(data="weight"):
+        idx1 = node_index[node1]
+        idx2 = node_index[node2]
+        if idx1 == idx2:
+            growth_rates[idx1] = weight
+            continue
+        coefficients[idx1][idx2] = weight
+        if not G.is_directed():
+            coefficients[idx2][idx1] = weight
 
     return SimulationPopulations(
         initial_populations,
         growth_rates,
         coefficients,
     )
+
+
+def matrix_to_graph(populations: SimulationPopulations) -> nx.DiGraph:
+    """The network of a trial as a networkx graph, such as to plot it"""
+    G = nx.DiGraph()
+    for idx, population in enumerate(populations.initial_populations):
+        G.add_node(idx, population=population)
+    for idx, growth_rate in enumerate(populations.growth_rates):
+        G.add_edge(idx, idx, weight=growth_rate)
+    sparse = populations.get_sparse_coefficients()
+    G.add_weighted_edges_from(
+        zip(sparse.rows.tolist(), sparse.cols.tolist(), sparse.weights.tolist())
+    )
+    return G
@@ -0,0 +1,176 @@
+import pickle
+from os import getpid, listdir, makedirs, path, rename, utime
+from shutil import rmtree
+from threading import Lock, get_ident
+from typing import List, Tuple
+
+import numpy as np
+
+from config.parameters_api import ProgramParametersApi
+from env.program_env import program_env
+from model.simulation_series_id import SimulationSeriesId
+from model.simulation_trial import SimulationPopulations, SparseCoefficients
+from util.hashing import hash_digest
+from util.json_utils import json_dumps
+
+NETWORK_CACHE_VERSION = 4
+"""
+Increase to stop reading every network cached in an older format, or generated
+differently
+"""
+NETWORK_ARRAYS = ["initial_populations", "growth_rates"]
+COEFFICIENT_ARRAYS = ["rows", "cols", "weights"]
+"""The non-zero coefficients of a network, in COO order sorted by row"""
+COEFFICIENT_DTYPES = {"rows": np.int32, "cols": np.int32, "weights": np.float64}
+
+type Networks = List[Tuple[SimulationPopulations, object]]
+type RandomState = tuple
+
+
+def network_cache_key(
+    config: ProgramParametersApi, series_id: SimulationSeriesId
+) -> str:
+    """
+    The networks of a series only depend on the master seed, the series and the
+    parameters of the network generator. So the accuracy and epochs are left out,
+    letting sweeps over them reuse the same networks
+    """
+    parameters = {
+        name: value
+        for name, value in config.base.__dict__.items()
+        if name not in ("accuracy", "epochs")
+    }
+    key = {
+        "version": NETWORK_CACHE_VERSION,
+        "master_seed": config.get_master_seed().uuid,
+        "epoch": series_id.epoch,
+        "iteration": series_id.iteration,
+        "parameters": parameters,
+    }
+    return hash_digest(bytes(json_dumps(key), "ascii")).hex()
+
+
+class NetworkCache:
+    """
+    Generated networks kept on disk, with a directory for each series. Arrays are saved
+    as .npy files that are memory-mapped when read, the coefficients as only their
+    non-zero entries. The dense coefficients are only built if an engine needs them.
+    A series that can't be read counts as not cached, and is removed so it's stored
+    again. Once the cache is larger than 'max_bytes', the series that were least
+    recently read or written are removed
+    """
+
+    directory: str
+    max_bytes: int
+    total_bytes: int | None
+    """Size of every cached series, only scanned from disk when it is needed"""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+        self.lock = Lock()
+        makedirs(directory, exist_ok=True)
+
+    def load(self, key: str) -> Tuple[Networks, RandomState] | None:
+        """The cached networks, and the state of the series' Random after generating them"""
+        entry = path.join(self.directory, key)
+        try:
+            with open(path.join(entry, "networks.pkl"), "rb") as file:
+                network_settings, random_state = pickle.load(file)
+            networks = []
+            for i, settings in enumerate(network_settings):
+                arrays = [
+                    np.load(path.join(entry, f"{i}_{name}.npy"), mmap_mode="r")
+                    for name in NETWORK_ARRAYS
+                ]
+                coefficient_arrays = [
+                    np.load(
+                        path.join(entry, f"{i}_coefficient_{name}.npy"), mmap_mode="r"
+                    )
+                    for name in COEFFICIENT_ARRAYS
+                ]
+                sparse = SparseCoefficients(
+                    *coefficient_arrays, len(arrays[0]), is_sorted=True
+                )
+                networks.append(
+                    (SimulationPopulations(*arrays, None, sparse), settings)
+                )
+            # Marks the series as recently used
+            utime(entry)
+        except FileNotFoundError:
+            # Not cached yet, or evicted while being read
+            return None
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # Truncated or corrupt, so generated again and stored in its place
+            rmtree(entry, ignore_errors=True)
+            with self.lock:
+                self.total_bytes = None
+            return None
+        return networks, random_state
+
+    def store(self, key: str, networks: Networks, random_state: RandomState) -> None:
+        entry = path.join(self.directory, key)
+        if path.exists(entry):
+            return
+        # Written to a temporary directory first, so a partial series is never read
+        temp_entry = f"{entry}.{getpid()}-{get_ident()}.tmp"
+        makedirs(temp_entry)
+        with open(path.join(temp_entry, "networks.pkl"), "wb") as file:
+            settings = [settings for _, settings in networks]
+            pickle.dump((settings, random_state), file)
+        for i, (populations, _) in enumerate(networks):
+            for name in NETWORK_ARRAYS:
+                array = np.asarray(getattr(populations, name), dtype=np.float64)
+                np.save(path.join(temp_entry, f"{i}_{name}.npy"), array)
+            sparse = populations.get_sparse_coefficients()
+            for name in COEFFICIENT_ARRAYS:
+                array = getattr(sparse, name).astype(COEFFICIENT_DTYPES[name])
+                np.save(path.join(temp_entry, f"{i}_coefficient_{name}.npy"), array)
+        entry_bytes = _directory_bytes(temp_entry)
+        try:
+            rename(temp_entry, entry)
+        except OSError:
+            # Another thread or process cached the same series first
+            rmtree(temp_entry, ignore_errors=True)
+            return
+
+        with self.lock:
+            if self.total_bytes is not None:
+                self.total_bytes += entry_bytes
+            if self.total_bytes is None or self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Removes the least recently used series until the cache fits in max_bytes"""
+        entries = []
+        for name in listdir(self.directory):
+            entry = path.join(self.directory, name)
+            if name.endswith(".tmp") or not path.isdir(entry):
+                continue
+            try:
+                entries.append((path.getmtime(entry), _directory_bytes(entry), entry))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        self.total_bytes = sum(entry_bytes for _, entry_bytes, _ in entries)
+        for _, entry_bytes, entry in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            # Anything already memory-mapped stays readable after it's removed
+            rmtree(entry, ignore_errors=True)
+            self.total_bytes -= entry_bytes
+
+
+def _directory_bytes(directory: str) -> int:
+    return sum(path.getsize(path.join(directory, name)) for name in listdir(directory))
+
+
+def open_network_cache() -> NetworkCache | None:
+    cache_dir = program_env.run.network_cache_dir
+    if cache_dir is None:
+        return None
+    return NetworkCache(cache_dir, program_env.run.network_cache_max_bytes)
+
+
+network_cache = open_network_cache()
@@ -1,18 +1,23 @@
 from random import Random
 from typing import List, Tuple
 
-from networkx import Graph
-
 from config.base_parameters import SimulationAccuracyConfig
 from config.parameters_api import ProgramParametersApi
-from model.graph_util import graph_to_matrix
+from model.network_cache import network_cache, network_cache_key
 from model.simulation_series_id import SimulationSeriesId
 from model.simulation_trial import (
     SimulationAccuracy,
     SimulationPopulations,
     SimulationTrial,
 )
-from util.seed import Seed
+from util.random_util import StreamRandom
+from util.seed import (
+    ACCURACY_STREAM,
+    NETWORKS_STREAM,
+    STREAM_RANDOM_ALGORITHM,
+    Seed,
+    network_stream,
+)
 
 
 class SimulationSeries:
@@ -21,6 +26,8 @@ class SimulationSeries:
     # Per step random
     series_id: SimulationSeriesId
     random: Random
+    """Generates the accuracy, and the networks unless each network has its own stream"""
+    master_seed: Seed
 
     def __init__(
         self, config: ProgramParametersApi, series_id: SimulationSeriesId
@@ -30,22 +37,41 @@ class SimulationSeries:
         self.__generate_random(series_id)
 
     def __generate_random(self, series_id: SimulationSeriesId) -> None:
+        self.master_seed = self.config.get_master_seed()
+        if self.uses_streams():
+            epoch, iteration = series_id.epoch, series_id.iteration
+            counter = network_stream(0, ACCURACY_STREAM)
+            self.random = StreamRandom(
+                self.master_seed.generate_stream(epoch, iteration, counter)
+            )
+            return
+
         lst = series_id.to_bytes_list()
-        master_seed: Seed = self.config.get_master_seed()
-        self.random = master_seed.generate_random(*lst)
+        self.random = self.master_seed.generate_random(*lst)
+
+    def uses_streams(self) -> bool:
+        return self.config.base.random_algorithm == STREAM_RANDOM_ALGORITHM
+
+    def network_random(self, network: int) -> Random:
+        """
+        The Random a network of the series is generated from. With streams each network
+        has its own, so it doesn't depend on how much the networks before it drew
+        """
+        if not self.uses_streams():
+            return self.random
+        epoch, iteration = self.series_id.epoch, self.series_id.iteration
+        counter = network_stream(network, NETWORKS_STREAM)
+        return StreamRandom(self.master_seed.generate_stream(epoch, iteration, counter))
 
     def iteration_generate_trials(self) -> List[SimulationTrial]:
         # Populations
-        network_graphs: List[Tuple[Graph, object]] = self.config.generate_networks(
-            self.random
-        )
+        networks: List[Tuple[SimulationPopulations, object]] = self.generate_networks()
         # Accuracy
         accuracy_list = self.iteration_generate_settings()
 
         # Generate each set of trials for each generated network
         trials = []
-        for graph, settings in network_graphs:
-            population: SimulationPopulations = graph_to_matrix(graph)
+        for population, settings in networks:
             for accuracy in accuracy_list:
                 index = len(trials)
                 trial = SimulationTrial(
@@ -58,6 +84,22 @@ class SimulationSeries:
                 trials.append(trial)
         return trials
 
+    def generate_networks(self) -> List[Tuple[SimulationPopulations, object]]:
+        if network_cache is None:
+            return self.config.generate_networks(self.network_random)
+
+        key = network_cache_key(self.config, self.series_id)
+        cached = network_cache.load(key)
+        if cached is not None:
+            networks, random_state = cached
+            # The accuracy is generated next, from where generating networks left off
+            self.random.setstate(random_state)
+            return networks
+
+        networks = self.config.generate_networks(self.network_random)
+        network_cache.store(key, networks, self.random.getstate())
+        return networks
+
     def iteration_generate_settings(self) -> List[SimulationAccuracy]:
         accuracy: SimulationAccuracyConfig = self.config.accuracy
         # Get static accuracy variables
@@ -72,6 +114,10 @@ class SimulationSeries:
                 euler_step=settings[0],
                 extinct_if_below=settings[1],
                 max_time=max_time,
+                steady_state_tolerance=accuracy.steady_state_tolerance,
+                integrator=accuracy.integrator,
+                adaptive_rtol=accuracy.adaptive_rtol,
+                adaptive_atol=accuracy.adaptive_atol,
             )
             accuracy_list.append(accuracy)
         return accuracy_list
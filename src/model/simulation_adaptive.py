@@ -0,0 +1,173 @@
+import numpy as np
+
+from model.simulation_recorder import GenerationsRecorder, SimulationRecorder
+from model.simulation_trial import (
+    Generation,
+    SimulationAccuracy,
+    SimulationPopulations,
+    SimulationTrial,
+)
+
+# Dormand-Prince 5(4) Butcher tableau
+DP_A = np.array(
+    [
+        [0, 0, 0, 0, 0, 0],
+        [1 / 5, 0, 0, 0, 0, 0],
+        [3 / 40, 9 / 40, 0, 0, 0, 0],
+        [44 / 45, -56 / 15, 32 / 9, 0, 0, 0],
+        [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0, 0],
+        [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656, 0],
+        [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+    ]
+)
+"""The last row is the 5th order solution, which is also the first stage of the next step"""
+DP_E = np.array(
+    [71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40]
+)
+"""Difference between the 5th and embedded 4th order solutions, used as the error estimate"""
+
+SAFETY = 0.9
+MIN_FACTOR = 0.2
+MAX_FACTOR = 5.0
+MIN_STEP = 1e-12
+"""Any step smaller than this means the populations are going to infinity"""
+
+
+def simulate_adaptive[R](
+    trial: SimulationTrial, recorder: SimulationRecorder[R] | None = None
+) -> R:
+    """
+    Solves the same system as simulate_cpu with an adaptive Dormand-Prince 5(4)
+    integrator. Calm phases take large steps, and the solution is interpolated onto
+    the same rounded_euler_step grid so the Generations stay compatible.
+    """
+    populations: SimulationPopulations = trial.populations
+    accuracy: SimulationAccuracy = trial.accuracy
+    if recorder is None:
+        recorder = GenerationsRecorder(trial)
+
+    coefficients: np.ndarray[np.ndarray[float]] = np.array(populations.coefficients)
+    growth_rates: np.ndarray[float] = np.array(populations.growth_rates)
+    last_generation: Generation = np.array(populations.initial_populations)
+    species_count: int = len(last_generation)
+
+    rounded_iterations: int = accuracy.rounded_iterations()
+    rounded_step: float = accuracy.rounded_euler_step
+    end_time: float = (rounded_iterations - 1) * rounded_step
+
+    recorder.record(0, last_generation)
+
+    def rhs(generation: Generation) -> np.ndarray[float]:
+        return generation * (coefficients.dot(generation) + growth_rates)
+
+    stages = np.zeros((len(DP_A), species_count))
+    stages[0] = rhs(last_generation)
+    time = 0.0
+    step = accuracy.euler_step
+    next_generation_t = 1
+
+    while next_generation_t < rounded_iterations:
+        step = min(step, end_time - time)
+        if step < MIN_STEP:
+            recorder.fail(next_generation_t)
+            break
+
+        for stage in range(1, len(DP_A)):
+            stage_generation = last_generation + step * DP_A[stage, :stage].dot(
+                stages[:stage]
+            )
+            stages[stage] = rhs(stage_generation)
+        new_generation = stage_generation
+
+        scale = accuracy.adaptive_atol + accuracy.adaptive_rtol * np.maximum(
+            np.abs(last_generation), np.abs(new_generation)
+        )
+        error = np.sqrt(np.mean(np.square(step * DP_E.dot(stages) / scale)))
+        if not np.isfinite(error) or error > 1:
+            # Reject the step and retry with a smaller one
+            factor = SAFETY * error ** (-1 / 5) if np.isfinite(error) else MIN_FACTOR
+            step *= max(MIN_FACTOR, factor)
+            continue
+
+        # Calculate failed simulation if any elements go to infinity
+        if np.any(new_generation > 1e30):
+            recorder.fail(next_generation_t)
+            break
+
+        next_generation_t = _interpolate_generations(
+            recorder,
+            next_generation_t,
+            rounded_step,
+            time,
+            step,
+            last_generation,
+            stages[0],
+            new_generation,
+            stages[-1],
+            accuracy.extinct_if_below,
+        )
+
+        # Calculate extinct species
+        is_extinct = np.logical_or(
+            np.isnan(new_generation),
+            new_generation < accuracy.extinct_if_below,
+        )
+        if np.any(is_extinct):
+            new_generation[is_extinct] = 0
+            stages[0] = rhs(new_generation)
+        else:
+            stages[0] = stages[-1]
+        last_generation = new_generation
+        time += step
+
+        if not np.any(last_generation):
+            # Every species is extinct, so the rest of generations stays 0
+            break
+
+        factor = SAFETY * error ** (-1 / 5) if error != 0 else MAX_FACTOR
+        step *= min(MAX_FACTOR, max(MIN_FACTOR, factor))
+
+    return recorder.result()
+
+
+def _interpolate_generations(
+    recorder: SimulationRecorder,
+    next_generation_t: int,
+    rounded_step: float,
+    time: float,
+    step: float,
+    start: Generation,
+    start_slope: np.ndarray[float],
+    end: Generation,
+    end_slope: np.ndarray[float],
+    extinct_if_below: float,
+) -> int:
+    """
+    Fills every rounded generation inside this step with a cubic hermite interpolation.
+
+    Returns the next rounded generation that has not been filled
+    """
+    # Small tolerance so the last generation isn't missed from rounding error
+    end_t = int((time + step) / rounded_step + 1e-9) + 1
+    end_t = min(end_t, recorder.rounded_iterations)
+    if end_t <= next_generation_t:
+        return next_generation_t
+
+    theta = (np.arange(next_generation_t, end_t) * rounded_step - time) / step
+    theta2 = theta * theta
+    theta3 = theta2 * theta
+    h00 = 2 * theta3 - 3 * theta2 + 1
+    h10 = theta3 - 2 * theta2 + theta
+    h01 = -2 * theta3 + 3 * theta2
+    h11 = theta3 - theta2
+
+    interpolated = (
+        np.outer(start, h00)
+        + np.outer(step * start_slope, h10)
+        + np.outer(end, h01)
+        + np.outer(step * end_slope, h11)
+    )
+    interpolated[interpolated < extinct_if_below] = 0
+    for i, generation_t in enumerate(range(next_generation_t, end_t)):
+        recorder.record(generation_t, interpolated[:, i])
+    return end_t
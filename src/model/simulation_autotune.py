@@ -0,0 +1,189 @@
+import json
+import platform
+from os import cpu_count, getpid, makedirs, path, replace
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+import numba
+import numpy as np
+
+from model.simulation_engine import CPU_ENGINES, ENGINES, SimulationEngine
+from model.simulation_recorder import SurvivalRecorder
+from model.simulation_trial import (
+    SimulationAccuracy,
+    SimulationPopulations,
+    SimulationTrial,
+)
+from util.hashing import hash_digest_json
+from util.json_utils import write_file
+
+CALIBRATION_VERSION = 1
+"""Increase to discard every cached calibration, such as after an engine changes"""
+CALIBRATION_SPECIES_COUNTS = [8, 32, 128, 512]
+CALIBRATION_DENSITIES = [0.02, 0.1, 0.5]
+"""Fraction of the coefficients that are non-zero"""
+CALIBRATION_BATCH_SIZE = 8
+"""How many trials the batched engine steps together while being calibrated"""
+CALIBRATION_ACCURACY = SimulationAccuracy(euler_step=0.01, max_time=2)
+
+
+def calibration_key() -> str:
+    """Identifies the machine and libraries a calibration was measured with"""
+    return hash_digest_json(
+        {
+            "version": CALIBRATION_VERSION,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "node": platform.node(),
+            "cpu_count": cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "numba": numba.__version__,
+        }
+    )
+
+
+class EngineAutotuner:
+    """
+    Predicts which engine is fastest for a trial from how long each engine took to
+    run calibration trials of a similar species count and density.
+    The batched engine is only chosen for a whole series, by prefers_batch, as it runs
+    a trial padded to the shape of the largest trial it is batched with
+    """
+
+    species_counts: List[int]
+    densities: List[float]
+    seconds: Dict[str, List[List[float]]]
+    """Seconds each engine took per trial per euler step, by species count then density"""
+
+    def __init__(self, species_counts, densities, seconds) -> None:
+        self.species_counts = species_counts
+        self.densities = densities
+        self.seconds = seconds
+
+    @staticmethod
+    def load_or_calibrate(calibration_file: str) -> "EngineAutotuner":
+        """Calibrates this machine once, and caches it in 'calibration_file'"""
+        calibrations = {}
+        try:
+            with open(calibration_file, "r") as file:
+                calibrations = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            # Missing or unreadable, either way this machine isn't calibrated
+            pass
+
+        key = calibration_key()
+        if key in calibrations:
+            return EngineAutotuner(**calibrations[key])
+
+        print("Calibrating which simulation engine is fastest. This is only done once")
+        autotuner = EngineAutotuner.calibrate()
+        calibrations[key] = autotuner.__dict__
+        parent = path.dirname(calibration_file)
+        if parent and not path.exists(parent):
+            makedirs(parent)
+        # Replaced in one step, so other processes never read a partly written file
+        temp_file = f"{calibration_file}.{getpid()}.tmp"
+        write_file(calibrations, temp_file)
+        replace(temp_file, calibration_file)
+        return autotuner
+
+    @staticmethod
+    def calibrate() -> "EngineAutotuner":
+        seconds = {
+            name: [
+                [0.0] * len(CALIBRATION_DENSITIES) for _ in CALIBRATION_SPECIES_COUNTS
+            ]
+            for name in CPU_ENGINES
+        }
+        for i, species_count in enumerate(CALIBRATION_SPECIES_COUNTS):
+            for j, density in enumerate(CALIBRATION_DENSITIES):
+                trials = [
+                    _calibration_trial(species_count, density, seed)
+                    for seed in range(CALIBRATION_BATCH_SIZE)
+                ]
+                for name in CPU_ENGINES:
+                    seconds[name][i][j] = _time_engine(ENGINES[name], trials)
+        return EngineAutotuner(
+            CALIBRATION_SPECIES_COUNTS, CALIBRATION_DENSITIES, seconds
+        )
+
+    def choose(self, trial: SimulationTrial) -> SimulationEngine:
+        """The fastest engine to run 'trial' on its own"""
+        i, j = self._nearest(*_shape(trial))
+        fastest = min(
+            (name for name in self.seconds if not ENGINES[name].batched),
+            key=lambda name: self.seconds[name][i][j],
+        )
+        return ENGINES[fastest]
+
+    def prefers_batch(self, trials: List[SimulationTrial]) -> bool:
+        """
+        If stepping 'trials' together is predicted to be faster than running each on its
+        fastest engine. The batch pads every trial to the most species and edges of any
+        of them, and steps each to the longest time of any of them
+        """
+        if "batched" not in self.seconds or len(trials) < 2:
+            return False
+        shapes = [_shape(trial) for trial in trials]
+        steps = max(trial.accuracy.iterations() for trial in trials)
+        i, j = self._nearest(
+            max(species for species, _ in shapes), max(edges for _, edges in shapes)
+        )
+        batched = len(trials) * steps * self.seconds["batched"][i][j]
+        alone = 0.0
+        for trial, shape in zip(trials, shapes):
+            i, j = self._nearest(*shape)
+            fastest = min(
+                self.seconds[name][i][j]
+                for name in self.seconds
+                if not ENGINES[name].batched
+            )
+            alone += trial.accuracy.iterations() * fastest
+        return batched < alone
+
+    def _nearest(self, species_count: int, edge_count: int) -> Tuple[int, int]:
+        """The calibrated shape nearest to a trial's"""
+        density = max(edge_count, 1) / species_count**2
+        # Nearest by log, as runtime scales with the log of both
+        i = np.argmin(np.abs(np.log(self.species_counts) - np.log(species_count)))
+        j = np.argmin(np.abs(np.log(self.densities) - np.log(density)))
+        return i, j
+
+
+def _shape(trial: SimulationTrial) -> Tuple[int, int]:
+    """The species count and edge count of a trial"""
+    populations = trial.populations
+    species_count = len(populations.initial_populations)
+    return species_count, populations.get_sparse_coefficients().edge_count()
+
+
+def _calibration_trial(
+    species_count: int, density: float, seed: int
+) -> SimulationTrial:
+    """A network where every species stays alive, so no engine can skip any work"""
+    rng = np.random.default_rng(seed)
+    coefficients = rng.uniform(-0.1, 0, (species_count, species_count))
+    coefficients *= rng.random((species_count, species_count)) < density
+    populations = SimulationPopulations(
+        np.full(species_count, 0.1), np.full(species_count, 0.1), coefficients
+    )
+    return SimulationTrial(None, seed, None, populations, CALIBRATION_ACCURACY)
+
+
+def _time_engine(engine: SimulationEngine, trials: List[SimulationTrial]) -> float:
+    def run() -> float:
+        recorders = [SurvivalRecorder(trial) for trial in trials]
+        start = perf_counter()
+        if engine.batched:
+            engine.simulate_all(trials, recorders)
+        else:
+            # A single trial is enough to time an engine that runs them one at a time
+            engine.simulate(trials[0], recorders[0])
+        duration = perf_counter() - start
+        return duration / (len(trials) if engine.batched else 1)
+
+    # The first run is only to compile or import the engine
+    run()
+    duration = min(run(), run())
+    return duration / CALIBRATION_ACCURACY.iterations()
@@ -0,0 +1,137 @@
+from typing import Dict, List
+
+import numpy as np
+
+from model.simulation_recorder import (
+    BLOCK_SIZE,
+    GenerationsRecorder,
+    SimulationRecorder,
+)
+from model.simulation_trial import (
+    GENERATIONS_DTYPE,
+    SimulationAccuracy,
+    SimulationPopulations,
+    SimulationTrial,
+)
+
+
+def simulate_batched[R](
+    trials: List[SimulationTrial],
+    recorders: List[SimulationRecorder[R]] | None = None,
+) -> List[R]:
+    """
+    Steps many trials together as one padded (trials x species) batch so the numpy
+    call overhead of each euler step is shared by the whole batch.
+
+    Trials can come from any number of series. They are grouped by steps_in_precise
+    so that every trial in a batch reaches a rounded generation on the same step.
+    """
+    if recorders is None:
+        recorders = [GenerationsRecorder(trial) for trial in trials]
+
+    groups: Dict[int, List[int]] = {}
+    for i, trial in enumerate(trials):
+        groups.setdefault(trial.accuracy.steps_in_precise(), []).append(i)
+
+    for steps_in_precise, indices in groups.items():
+        batch = [trials[i] for i in indices]
+        _simulate_batch(batch, [recorders[i] for i in indices], steps_in_precise)
+    return [recorder.result() for recorder in recorders]
+
+
+def _simulate_batch(
+    trials: List[SimulationTrial],
+    recorders: List[SimulationRecorder],
+    steps_in_precise: int,
+) -> None:
+    batch_size: int = len(trials)
+    species_counts = [len(trial.populations.initial_populations) for trial in trials]
+    max_species: int = max(species_counts)
+
+    # Padded species have no population and no interactions, so they stay extinct
+    coefficients = np.zeros((batch_size, max_species, max_species))
+    growth_rates = np.zeros((batch_size, max_species))
+    last_generation = np.zeros((batch_size, max_species))
+    euler_steps = np.zeros((batch_size, 1))
+    extinct_if_below = np.zeros((batch_size, 1))
+    rounded_iterations = np.zeros(batch_size, dtype=np.int64)
+
+    for b, trial in enumerate(trials):
+        populations: SimulationPopulations = trial.populations
+        accuracy: SimulationAccuracy = trial.accuracy
+        n = species_counts[b]
+
+        coefficients[b, :n, :n] = populations.coefficients
+        growth_rates[b, :n] = populations.growth_rates
+        last_generation[b, :n] = populations.initial_populations
+        euler_steps[b] = accuracy.euler_step
+        extinct_if_below[b] = accuracy.extinct_if_below
+        rounded_iterations[b] = accuracy.rounded_iterations()
+        recorders[b].record(0, last_generation[b, :n])
+
+    timesteps = (rounded_iterations - 1) * steps_in_precise
+    failed_at = np.full(batch_size, -1, dtype=np.int64)
+
+    precise_generation = np.zeros((batch_size, max_species, steps_in_precise))
+    block = np.zeros((batch_size, max_species, BLOCK_SIZE), dtype=GENERATIONS_DTYPE)
+    block_start = 1
+
+    def flush_block(block_len: int) -> None:
+        for b in range(batch_size):
+            end = min(block_start + block_len, rounded_iterations[b])
+            if failed_at[b] != -1:
+                # Failed trials are frozen at 0, which must not be recorded
+                end = min(end, failed_at[b])
+            if end <= block_start:
+                continue
+            n = species_counts[b]
+            recorders[b].record_block(block_start, block[b, :n, : end - block_start])
+
+    for t in range(0, timesteps.max()):
+        # Freeze any trial that has run for all of its own timesteps
+        finished = timesteps == t
+        if np.any(finished):
+            euler_steps[finished] = 0
+
+        change_in_population = np.matmul(coefficients, last_generation[:, :, None])
+        change_in_population = change_in_population[:, :, 0] + growth_rates
+
+        change_in_population *= last_generation * euler_steps
+
+        new_generation = last_generation + change_in_population
+
+        # Calculate failed trials if any elements go to infinity
+        is_infinity = np.logical_or(np.isinf(new_generation), new_generation > 1e30)
+        if np.any(is_infinity):
+            failed = np.any(is_infinity, axis=1)
+            failed_at[failed] = (t + 1) // steps_in_precise
+            euler_steps[failed] = 0
+            new_generation[failed] = 0
+            if np.all(np.logical_or(failed_at != -1, timesteps <= t)):
+                break
+
+        # Calculate extinct species
+        is_extinct = np.logical_or(
+            np.isnan(new_generation),
+            new_generation < extinct_if_below,
+        )
+        new_generation[is_extinct] = 0
+
+        precise_generation[:, :, t % steps_in_precise] = last_generation = (
+            new_generation
+        )
+
+        if (t + 1) % steps_in_precise == 0:
+            # average precise_generations to append to the block of generations
+            generation_t = (t + 1) // steps_in_precise
+            block_t = generation_t - block_start
+            block[:, :, block_t] = precise_generation.mean(axis=2)
+            if block_t == BLOCK_SIZE - 1:
+                flush_block(BLOCK_SIZE)
+                block_start += BLOCK_SIZE
+
+    flush_block(BLOCK_SIZE)
+
+    for b, generation_t in enumerate(failed_at):
+        if generation_t != -1:
+            recorders[b].fail(generation_t)
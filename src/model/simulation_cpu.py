@@ -1,41 +1,63 @@
 import numpy as np
 
-from model.graph_util import SimulationPopulations
+from model.simulation_recorder import GenerationsRecorder, SimulationRecorder
 from model.simulation_trial import (
     Generation,
     Generations,
     SimulationAccuracy,
+    SimulationPopulations,
     SimulationTrial,
+    SparseCoefficients,
 )
 
-GENERATIONS_DTYPE = np.float64
+COMPACT_INTERVAL = 64
+"""How many rounded generations between checking for extinct species to compact away"""
+COMPACT_RATIO = 0.8
+"""Compact once the surviving species are at most this fraction of the simulated species"""
 
 np.seterr(over="ignore", under="ignore")
 
 
-def simulate_cpu(trial: SimulationTrial) -> Generations:
+def simulate_cpu[R](
+    trial: SimulationTrial, recorder: SimulationRecorder[R] | None = None
+) -> R:
+    coefficients: np.ndarray[np.ndarray[float]] = np.array(
+        trial.populations.coefficients
+    )
+    return simulate_numpy(trial, coefficients, recorder)
+
+
+def simulate_numpy[R](
+    trial: SimulationTrial,
+    coefficients: np.ndarray[np.ndarray[float]] | SparseCoefficients,
+    recorder: SimulationRecorder[R] | None = None,
+) -> R:
+    """Forward euler loop shared by the dense and sparse numpy engines"""
     populations: SimulationPopulations = trial.populations
     accuracy: SimulationAccuracy = trial.accuracy
+    if recorder is None:
+        recorder = GenerationsRecorder(trial)
 
     initial_populations: np.ndarray[float] = np.array(populations.initial_populations)
-    coefficients: np.ndarray[np.ndarray[float]] = np.array(populations.coefficients)
     growth_rates: np.ndarray[float] = np.array(populations.growth_rates)
 
     species_count: int = len(initial_populations)
 
-    generations: Generations = np.zeros(
-        (species_count, accuracy.rounded_iterations()), dtype=GENERATIONS_DTYPE
-    )
-
     steps_in_precise: int = accuracy.steps_in_precise()
     precise_generation: Generations = np.zeros((species_count, steps_in_precise))
 
-    generations[:, 0] = initial_populations
+    recorder.record(0, initial_populations)
     last_generation: Generation = initial_populations
 
+    # The original species index of each simulated species.
+    # None until the first compaction so the common case uses cheap slicing
+    species_ids: np.ndarray[int] | None = None
+    # The rounded generation at the last check, used to detect a steady state
+    steady_reference: Generation | None = None
+
     for t in range(0, accuracy.iterations() - steps_in_precise):
         change_in_population: np.ndarray[float] = (
-            np.squeeze(np.dot(coefficients, last_generation)) + growth_rates
+            np.squeeze(coefficients.dot(last_generation)) + growth_rates
         )
 
         change_in_population *= last_generation * accuracy.euler_step
@@ -45,7 +67,7 @@ def simulate_cpu(trial: SimulationTrial) -> Generations:
         # Calculate failed simulation if any elements go to infinity
         is_infinity = np.logical_or(np.isinf(new_generation), new_generation > 1e30)
         if np.any(is_infinity):
-            generations[:, (t + 1) // steps_in_precise :] = -1
+            recorder.fail((t + 1) // steps_in_precise)
             break
 
         # Calculate extinct species
@@ -60,9 +82,58 @@ def simulate_cpu(trial: SimulationTrial) -> Generations:
         if (t + 1) % steps_in_precise == 0:
             # average precise_generations to append to generations
             generation_t = (t + 1) // steps_in_precise
-            generations[:, generation_t] = precise_generation.mean(axis=1)
+            generation: Generation = precise_generation.mean(axis=1)
+            rows = slice(None) if species_ids is None else species_ids
+            recorder.record(generation_t, generation, rows)
+
+            if generation_t % COMPACT_INTERVAL != 0:
+                continue
+            alive = np.flatnonzero(last_generation)
+            if len(alive) == 0:
+                # Every species is extinct, so the rest of generations stays 0
+                break
+
+            if steady_reference is not None:
+                alive_generation = generation[alive]
+                window_change = np.abs(alive_generation - steady_reference[alive])
+                step_change = (
+                    np.abs(change_in_population[alive]) / last_generation[alive]
+                )
+                max_change = max(
+                    (window_change / alive_generation).max(), step_change.max()
+                )
+                if max_change < accuracy.steady_state_tolerance:
+                    # Converged to a fixed point, so every later generation is the same
+                    recorder.fill(generation_t, generation, rows)
+                    break
+            if accuracy.steady_state_tolerance:
+                steady_reference = generation
+
+            # Extinct species stay extinct, so drop them from all future steps.
+            # Their rows in generations are already 0 from here on
+            if len(alive) > COMPACT_RATIO * len(last_generation):
+                continue
+            coefficients = compact_coefficients(coefficients, alive)
+            growth_rates = growth_rates[alive]
+            last_generation = last_generation[alive]
+            precise_generation = precise_generation[alive]
+            if steady_reference is not None:
+                steady_reference = steady_reference[alive]
+            if species_ids is None:
+                species_ids = alive
+            else:
+                species_ids = species_ids[alive]
 
-    # print(f"survived = {np.sum(generations[:, -1] != 0)}")
     # plot_generations(generations, trial)
 
-    return generations
+    return recorder.result()
+
+
+def compact_coefficients(
+    coefficients: np.ndarray[np.ndarray[float]] | SparseCoefficients,
+    alive: np.ndarray[int],
+) -> np.ndarray[np.ndarray[float]] | SparseCoefficients:
+    """Only keep the interactions between the 'alive' species"""
+    if isinstance(coefficients, SparseCoefficients):
+        return coefficients.take(alive)
+    return coefficients[np.ix_(alive, alive)]
@@ -0,0 +1,83 @@
+from typing import Callable, Dict, List
+
+from model.simulation_recorder import SimulationRecorder
+from model.simulation_trial import SimulationTrial
+
+
+class SimulationEngine:
+    """A way to run euler trials. Its module is only imported once it is first used"""
+
+    name: str
+    batched: bool
+    """If the simulate function takes a list of trials and recorders to run together"""
+    _load: Callable[[], Callable]
+    _simulate: Callable | None
+
+    def __init__(self, name: str, load: Callable[[], Callable], batched=False) -> None:
+        self.name = name
+        self.batched = batched
+        self._load = load
+        self._simulate = None
+
+    def get_simulate_fn(self) -> Callable:
+        if self._simulate is None:
+            self._simulate = self._load()
+        return self._simulate
+
+    def simulate[R](self, trial: SimulationTrial, recorder: SimulationRecorder[R]) -> R:
+        if self.batched:
+            return self.get_simulate_fn()([trial], [recorder])[0]
+        return self.get_simulate_fn()(trial, recorder)
+
+    def simulate_all[R](
+        self, trials: List[SimulationTrial], recorders: List[SimulationRecorder[R]]
+    ) -> List[R]:
+        if self.batched:
+            return self.get_simulate_fn()(trials, recorders)
+        simulate = self.get_simulate_fn()
+        return [simulate(trial, recorder) for trial, recorder in zip(trials, recorders)]
+
+
+def _load_cpu():
+    from model.simulation_cpu import simulate_cpu
+
+    return simulate_cpu
+
+
+def _load_sparse():
+    from model.simulation_sparse import simulate_sparse
+
+    return simulate_sparse
+
+
+def _load_jit():
+    from model.simulation_jit import simulate_jit
+
+    return simulate_jit
+
+
+def _load_batched():
+    from model.simulation_batched import simulate_batched
+
+    return simulate_batched
+
+
+def _load_gpu():
+    from model.simulation_gpu import simulate_gpu
+
+    return simulate_gpu
+
+
+ENGINES: Dict[str, SimulationEngine] = {
+    engine.name: engine
+    for engine in [
+        SimulationEngine("cpu", _load_cpu),
+        SimulationEngine("sparse", _load_sparse),
+        SimulationEngine("jit", _load_jit),
+        SimulationEngine("batched", _load_batched, batched=True),
+        SimulationEngine("gpu", _load_gpu),
+    ]
+}
+
+CPU_ENGINES: List[str] = ["cpu", "sparse", "jit", "batched"]
+"""The engines that are always available, and so are calibrated by the autotuner"""
@@ -4,8 +4,8 @@ import numba
 import numpy as np
 from numba import cuda, float64, int32
 
+from model.simulation_recorder import GenerationsRecorder, SimulationRecorder
 from model.simulation_trial import (
-    Generations,
     SimulationAccuracy,
     SimulationPopulations,
     SimulationTrial,
@@ -15,14 +15,18 @@ NP_DTYPE = np.float64
 NB_DTYPE = float64
 
 
-def simulate_gpu(trial: SimulationTrial) -> Generations:
+def simulate_gpu[R](
+    trial: SimulationTrial, recorder: SimulationRecorder[R] | None = None
+) -> R:
     populations: SimulationPopulations = trial.populations
     accuracy: SimulationAccuracy = trial.accuracy
+    if recorder is None:
+        recorder = GenerationsRecorder(trial)
 
     steps_in_rounded: int = accuracy.rounded_iterations()
     steps_in_precise: int = accuracy.steps_in_precise()
     timesteps = accuracy.iterations() - steps_in_precise
-    return simulate_wrapper(
+    generations = simulate_wrapper(
         populations.initial_populations,
         populations.growth_rates,
         populations.coefficients,
@@ -32,6 +36,8 @@ def simulate_gpu(trial: SimulationTrial) -> Generations:
         accuracy.extinct_if_below,
         accuracy.euler_step,
     )
+    recorder.record_generations(generations)
+    return recorder.result()
 
 
 def simulate_wrapper(
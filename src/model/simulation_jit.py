@@ -0,0 +1,281 @@
+import math
+
+import numpy as np
+from numba import float64, int64, njit
+
+from model.simulation_cpu import COMPACT_INTERVAL, COMPACT_RATIO
+from model.simulation_recorder import (
+    BLOCK_SIZE,
+    GenerationsRecorder,
+    SimulationRecorder,
+)
+from model.simulation_trial import (
+    GENERATIONS_DTYPE,
+    Generations,
+    SimulationAccuracy,
+    SimulationPopulations,
+    SimulationTrial,
+)
+
+NP_DTYPE = np.float64
+NB_DTYPE = float64
+
+# What jit_simulate returned, other than the generation it went to infinity at
+DONE = -1
+BLOCK_FULL = -2
+STEADY = -3
+RUNNING = -4
+"""Only used inside jit_simulate, is never returned"""
+
+# Indices of the 'state' jit_simulate resumes from after filling a block
+STATE_TIMESTEP = 0
+STATE_SPECIES_COUNT = 1
+STATE_HAS_STEADY_REFERENCE = 2
+STATE_BLOCK_START = 3
+STATE_SWAPPED = 4
+
+
+def simulate_jit[R](
+    trial: SimulationTrial, recorder: SimulationRecorder[R] | None = None
+) -> R:
+    populations: SimulationPopulations = trial.populations
+    accuracy: SimulationAccuracy = trial.accuracy
+    if recorder is None:
+        recorder = GenerationsRecorder(trial)
+
+    initial_populations = np.array(populations.initial_populations, dtype=NP_DTYPE)
+    growth_rates = np.array(populations.growth_rates, dtype=NP_DTYPE)
+    # Copied because the kernel compacts the coefficients in place
+    coefficients = np.array(populations.coefficients, dtype=NP_DTYPE)
+    species_count: int = len(initial_populations)
+
+    steps_in_precise: int = accuracy.steps_in_precise()
+    timesteps: int = accuracy.iterations() - steps_in_precise
+
+    recorder.record(0, initial_populations)
+
+    last_generation = np.array(initial_populations)
+    next_generation = np.zeros(species_count, dtype=NP_DTYPE)
+    precise_sum = np.zeros(species_count, dtype=NP_DTYPE)
+    steady_reference = np.zeros(species_count, dtype=NP_DTYPE)
+    species_ids = np.arange(species_count, dtype=np.int64)
+    surviving = np.zeros(species_count, dtype=np.int64)
+    block: Generations = np.zeros((species_count, BLOCK_SIZE), dtype=GENERATIONS_DTYPE)
+    state = np.zeros(5, dtype=np.int64)
+    state[STATE_SPECIES_COUNT] = species_count
+    state[STATE_BLOCK_START] = 1
+
+    while True:
+        status = jit_simulate(
+            last_generation,
+            next_generation,
+            precise_sum,
+            steady_reference,
+            species_ids,
+            surviving,
+            block,
+            state,
+            growth_rates,
+            coefficients,
+            timesteps,
+            steps_in_precise,
+            accuracy.extinct_if_below,
+            accuracy.euler_step,
+            accuracy.steady_state_tolerance,
+        )
+        block_start = state[STATE_BLOCK_START]
+        last_t = state[STATE_TIMESTEP] // steps_in_precise
+        recorder.record_block(block_start, block[:, : last_t - block_start + 1])
+        if status != BLOCK_FULL:
+            break
+        block[:] = 0
+        state[STATE_BLOCK_START] += BLOCK_SIZE
+
+    if status == STEADY:
+        recorder.fill(last_t, block[:, last_t - block_start])
+    elif status != DONE:
+        recorder.fail(status)
+
+    return recorder.result()
+
+
+@njit(cache=True, nogil=True)
+def jit_compact(
+    last_generation,
+    steady_reference,
+    species_ids,
+    surviving,
+    growth_rates,
+    coefficients,
+    species_count,
+):
+    """
+    Moves the surviving species to the front of each buffer once enough have gone extinct.
+    Survivors only ever move to a lower index, so this is safe to do in place.
+
+    Returns the new species_count
+    """
+    alive = 0
+    for species_id in range(species_count):
+        if last_generation[species_id] != 0:
+            surviving[alive] = species_id
+            alive += 1
+    if alive > COMPACT_RATIO * species_count:
+        return species_count
+
+    for new_id in range(alive):
+        species_id = surviving[new_id]
+        last_generation[new_id] = last_generation[species_id]
+        steady_reference[new_id] = steady_reference[species_id]
+        species_ids[new_id] = species_ids[species_id]
+        growth_rates[new_id] = growth_rates[species_id]
+        for i in range(alive):
+            coefficients[new_id, i] = coefficients[species_id, surviving[i]]
+    return alive
+
+
+@njit(
+    int64(
+        NB_DTYPE[:],
+        NB_DTYPE[:],
+        NB_DTYPE[:],
+        NB_DTYPE[:],
+        int64[:],
+        int64[:],
+        NB_DTYPE[:, :],
+        int64[:],
+        NB_DTYPE[:],
+        NB_DTYPE[:, :],
+        int64,
+        int64,
+        NB_DTYPE,
+        NB_DTYPE,
+        NB_DTYPE,
+    ),
+    cache=True,
+    nogil=True,
+)
+def jit_simulate(
+    last_generation,
+    next_generation,
+    precise_sum,
+    steady_reference,
+    species_ids,
+    surviving,
+    block,
+    state,
+    growth_rates,
+    coefficients,
+    timesteps,
+    steps_in_precise,
+    extinct_if_below,
+    euler_step,
+    steady_state_tolerance,
+):
+    """
+    Runs every euler step of simulate_cpu in a single fused loop without any allocations.
+    As species go extinct, every buffer is compacted in place down to the first
+    'species_count' surviving species, with 'species_ids' mapping back to generations.
+
+    Rounded generations are written to 'block' from state[STATE_BLOCK_START] onwards.
+    Once it is full this returns BLOCK_FULL, and can be called again with the same
+    buffers to continue from where it stopped.
+
+    Returns the rounded generation the simulation went to infinity at, or a status
+    """
+    species_count = state[STATE_SPECIES_COUNT]
+    has_steady_reference = state[STATE_HAS_STEADY_REFERENCE] != 0
+    block_start = state[STATE_BLOCK_START]
+    swapped = state[STATE_SWAPPED] != 0
+    if swapped:
+        last_generation, next_generation = next_generation, last_generation
+
+    for timestep in range(state[STATE_TIMESTEP], timesteps):
+        max_step_change = 0.0
+        for species_id in range(species_count):
+            population = last_generation[species_id]
+            if population == 0:
+                # Extinct species stay extinct
+                next_generation[species_id] = 0
+                continue
+
+            # dot product
+            change_in_population = 0.0
+            for i in range(species_count):
+                change_in_population += coefficients[species_id, i] * last_generation[i]
+            change_in_population += growth_rates[species_id]
+
+            change_in_population *= population * euler_step
+            population += change_in_population
+
+            if math.isinf(population) or population > 1e30:
+                state[STATE_TIMESTEP] = timestep
+                return (timestep + 1) // steps_in_precise
+            if math.isnan(population) or population < extinct_if_below:
+                population = 0
+            else:
+                step_change = abs(change_in_population) / population
+                max_step_change = max(max_step_change, step_change)
+            next_generation[species_id] = population
+            precise_sum[species_id] += population
+
+        last_generation, next_generation = next_generation, last_generation
+        swapped = not swapped
+
+        if (timestep + 1) % steps_in_precise != 0:
+            continue
+        # average the precise generations to append to generations
+        generation_t = (timestep + 1) // steps_in_precise
+        column = generation_t - block_start
+        for species_id in range(species_count):
+            block[species_ids[species_id], column] = (
+                precise_sum[species_id] / steps_in_precise
+            )
+            precise_sum[species_id] = 0
+
+        status = BLOCK_FULL if column == block.shape[1] - 1 else RUNNING
+        if generation_t % COMPACT_INTERVAL == 0:
+            alive = 0
+            max_change = max_step_change
+            for species_id in range(species_count):
+                if last_generation[species_id] == 0:
+                    continue
+                alive += 1
+                generation = block[species_ids[species_id], column]
+                window_change = (
+                    abs(generation - steady_reference[species_id]) / generation
+                )
+                max_change = max(max_change, window_change)
+
+            if alive == 0:
+                # Every species is extinct, so the rest of generations stays 0
+                status = DONE
+            elif has_steady_reference and max_change < steady_state_tolerance:
+                # Converged to a fixed point, so every later generation is the same
+                status = STEADY
+            else:
+                if steady_state_tolerance != 0:
+                    for species_id in range(species_count):
+                        row = species_ids[species_id]
+                        steady_reference[species_id] = block[row, column]
+                    has_steady_reference = True
+
+                species_count = jit_compact(
+                    last_generation,
+                    steady_reference,
+                    species_ids,
+                    surviving,
+                    growth_rates,
+                    coefficients,
+                    species_count,
+                )
+
+        if status != RUNNING:
+            state[STATE_TIMESTEP] = timestep + 1
+            state[STATE_SPECIES_COUNT] = species_count
+            state[STATE_HAS_STEADY_REFERENCE] = has_steady_reference
+            state[STATE_SWAPPED] = swapped
+            return status
+
+    state[STATE_TIMESTEP] = timesteps
+    return DONE
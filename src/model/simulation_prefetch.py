@@ -0,0 +1,64 @@
+from threading import Condition, Semaphore, Thread
+from typing import Dict, Iterator, List, Tuple
+
+from config.parameters_api import ProgramParametersApi
+from model.simulation import SimulationSeries
+from model.simulation_series_id import SimulationSeriesId
+from model.simulation_trial import SimulationTrial
+
+
+class TrialPrefetcher:
+    """
+    Generates the trials of upcoming series on its own thread, so the threads simulating
+    series don't have to wait on network generation. At most 'depth' series are kept
+    generated ahead of when they are taken
+    """
+
+    config: ProgramParametersApi
+    series_ids: Iterator[SimulationSeriesId]
+    ready: Dict[Tuple[int, int], List[SimulationTrial] | Exception]
+    """Generated trials by (epoch, iteration), or why they could not be generated"""
+
+    def __init__(
+        self,
+        config: ProgramParametersApi,
+        series_ids: Iterator[SimulationSeriesId],
+        depth: int,
+    ) -> None:
+        self.config = config
+        self.series_ids = series_ids
+        self.ready = {}
+        self.condition = Condition()
+        self.free_slots = Semaphore(depth)
+        # A daemon, so an early exit doesn't wait on series that will never be taken
+        self.thread = Thread(target=self._produce, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def _produce(self) -> None:
+        while True:
+            # Waits for a slot before taking the next series, as taking it can claim it
+            self.free_slots.acquire()
+            series_id = next(self.series_ids, None)
+            if series_id is None:
+                return
+            try:
+                simulation = SimulationSeries(self.config, series_id)
+                trials = simulation.iteration_generate_trials()
+            except Exception as e:
+                trials = e
+            with self.condition:
+                self.ready[(series_id.epoch, series_id.iteration)] = trials
+                self.condition.notify_all()
+
+    def take(self, series_id: SimulationSeriesId) -> List[SimulationTrial]:
+        """Waits until the trials of 'series_id' are generated"""
+        key = (series_id.epoch, series_id.iteration)
+        with self.condition:
+            self.condition.wait_for(lambda: key in self.ready)
+            trials = self.ready.pop(key)
+        self.free_slots.release()
+        if isinstance(trials, Exception):
+            raise trials
+        return trials
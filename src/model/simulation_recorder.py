@@ -0,0 +1,232 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from model.simulation_trial import (
+    GENERATIONS_DTYPE,
+    Generation,
+    Generations,
+    SimulationSurvival,
+    SimulationTrial,
+)
+
+type Rows = slice | np.ndarray[int]
+
+BLOCK_SIZE = 256
+"""How many rounded generations are buffered before being copied out"""
+
+
+class SimulationRecorder[R](ABC):
+    """
+    Where an engine sends each rounded generation as it is calculated.
+    'rows' are the original species index of each value in a (possibly compacted) generation,
+    any species left out of a generation has a population of 0
+    """
+
+    species_count: int
+    rounded_iterations: int
+
+    def __init__(self, trial: SimulationTrial) -> None:
+        self.species_count = len(trial.populations.initial_populations)
+        self.rounded_iterations = trial.accuracy.rounded_iterations()
+
+    @abstractmethod
+    def record(
+        self, generation_t: int, generation: Generation, rows: Rows = slice(None)
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def record_block(self, generation_t: int, block: Generations) -> None:
+        """Record every species for the rounded generations starting at generation_t"""
+        pass
+
+    @abstractmethod
+    def fill(
+        self, generation_t: int, generation: Generation, rows: Rows = slice(None)
+    ) -> None:
+        """Every generation after generation_t is the same as 'generation'"""
+        pass
+
+    @abstractmethod
+    def fail(self, generation_t: int) -> None:
+        """The simulation went to infinity at generation_t"""
+        pass
+
+    def record_generations(self, generations: Generations) -> None:
+        """Record a complete simulation at once, for engines that don't step on the host"""
+        is_failed = np.any(generations == -1, axis=0)
+        if not np.any(is_failed):
+            self.record_block(0, generations)
+            return
+        failed_at = int(np.argmax(is_failed))
+        self.record_block(0, generations[:, :failed_at])
+        self.fail(failed_at)
+
+    @abstractmethod
+    def result(self) -> R:
+        pass
+
+
+class GenerationsRecorder(SimulationRecorder[Generations]):
+    """Keeps every rounded generation of the simulation"""
+
+    generations: Generations
+
+    def __init__(self, trial: SimulationTrial) -> None:
+        super().__init__(trial)
+        self.generations = np.zeros(
+            (self.species_count, self.rounded_iterations), dtype=GENERATIONS_DTYPE
+        )
+
+    def record(self, generation_t, generation, rows=slice(None)) -> None:
+        self.generations[rows, generation_t] = generation
+
+    def record_block(self, generation_t, block) -> None:
+        self.generations[:, generation_t : generation_t + block.shape[1]] = block
+
+    def fill(self, generation_t, generation, rows=slice(None)) -> None:
+        self.generations[rows, generation_t + 1 :] = generation[:, None]
+
+    def fail(self, generation_t) -> None:
+        self.generations[:, generation_t:] = -1
+
+    def record_generations(self, generations) -> None:
+        self.generations = generations
+
+    def result(self) -> Generations:
+        return self.generations
+
+
+class SurvivalRecorder(SimulationRecorder[SimulationSurvival]):
+    """Only keeps how long each species survived, so memory doesn't grow with max_time"""
+
+    alive_generations: np.ndarray[int]
+    final_populations: Generation
+    previous_populations: Generation
+    """The generation before final_populations, in case a failure overwrites it"""
+    last_t: int
+    failed_at: int
+
+    def __init__(self, trial: SimulationTrial) -> None:
+        super().__init__(trial)
+        self.alive_generations = np.zeros(self.species_count, dtype=np.int64)
+        self.final_populations = np.zeros(self.species_count, dtype=GENERATIONS_DTYPE)
+        self.previous_populations = self.final_populations
+        self.last_t = -1
+        self.failed_at = -1
+
+    def record(self, generation_t, generation, rows=slice(None)) -> None:
+        self.alive_generations[rows] += generation != 0
+        self.previous_populations = self.final_populations
+        self.final_populations = np.zeros(self.species_count, dtype=GENERATIONS_DTYPE)
+        self.final_populations[rows] = generation
+        self.last_t = generation_t
+
+    def record_block(self, generation_t, block) -> None:
+        block_len = block.shape[1]
+        if block_len == 0:
+            return
+        self.alive_generations += np.count_nonzero(block, axis=1)
+        if block_len > 1:
+            self.previous_populations = np.array(block[:, -2])
+        else:
+            self.previous_populations = self.final_populations
+        self.final_populations = np.array(block[:, -1])
+        self.last_t = generation_t + block_len - 1
+
+    def fill(self, generation_t, generation, rows=slice(None)) -> None:
+        remaining = self.rounded_iterations - generation_t - 1
+        self.alive_generations[rows] += (generation != 0) * remaining
+
+    def fail(self, generation_t) -> None:
+        if self.last_t >= generation_t:
+            # The failed generation was already recorded, so it no longer counts
+            self.alive_generations -= self.final_populations != 0
+            self.final_populations = self.previous_populations
+        self.failed_at = generation_t
+
+    def result(self) -> SimulationSurvival:
+        return SimulationSurvival(
+            self.alive_generations, self.final_populations, self.failed_at
+        )
+
+
+class GenerationsSink(ABC):
+    """Consumes the rounded generations of a simulation one block of time at a time"""
+
+    @abstractmethod
+    def write_block(self, generation_t: int, block: Generations) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class BlockRecorder(SimulationRecorder[SimulationSurvival]):
+    """
+    Streams every rounded generation to a sink in blocks of 'block_size', so memory
+    depends on the block size rather than max_time. The survival is kept as well.
+    """
+
+    sink: GenerationsSink
+    survival: SurvivalRecorder
+    block: Generations
+    block_start: int
+
+    def __init__(
+        self, trial: SimulationTrial, sink: GenerationsSink, block_size=BLOCK_SIZE
+    ) -> None:
+        super().__init__(trial)
+        self.sink = sink
+        self.survival = SurvivalRecorder(trial)
+        self.block = np.zeros((self.species_count, block_size), dtype=GENERATIONS_DTYPE)
+        self.block_start = 0
+
+    def _move_to(self, generation_t: int) -> int:
+        """Flushes blocks until generation_t is in the block, returns its column"""
+        block_size = self.block.shape[1]
+        while generation_t >= self.block_start + block_size:
+            block_end = min(self.block_start + block_size, self.rounded_iterations)
+            self.sink.write_block(
+                self.block_start, self.block[:, : block_end - self.block_start]
+            )
+            self.block[:] = 0
+            self.block_start += block_size
+        return generation_t - self.block_start
+
+    def _fill_columns(self, generation_t: int, value, rows: Rows) -> None:
+        """Sets every generation from generation_t onwards to 'value'"""
+        while generation_t < self.rounded_iterations:
+            column = self._move_to(generation_t)
+            self.block[rows, column:] = value
+            generation_t += self.block.shape[1] - column
+
+    def record(self, generation_t, generation, rows=slice(None)) -> None:
+        self.survival.record(generation_t, generation, rows)
+        self.block[rows, self._move_to(generation_t)] = generation
+
+    def record_block(self, generation_t, block) -> None:
+        self.survival.record_block(generation_t, block)
+        block_t = 0
+        while block_t < block.shape[1]:
+            column = self._move_to(generation_t + block_t)
+            block_len = min(self.block.shape[1] - column, block.shape[1] - block_t)
+            self.block[:, column : column + block_len] = block[
+                :, block_t : block_t + block_len
+            ]
+            block_t += block_len
+
+    def fill(self, generation_t, generation, rows=slice(None)) -> None:
+        self.survival.fill(generation_t, generation, rows)
+        self._fill_columns(generation_t + 1, generation[:, None], rows)
+
+    def fail(self, generation_t) -> None:
+        self.survival.fail(generation_t)
+        self._fill_columns(generation_t, -1, slice(None))
+
+    def result(self) -> SimulationSurvival:
+        self._move_to(self.rounded_iterations + self.block.shape[1] - 1)
+        self.sink.close()
+        return self.survival.result()
@@ -0,0 +1,90 @@
+import heapq
+from typing import Dict, List, Tuple
+
+from model.simulation_series_id import SimulationSeriesId
+from model.simulation_trial import SimulationTrial
+
+
+def estimate_trial_cost(trial: SimulationTrial) -> int:
+    """
+    Relative time to simulate a trial: how many euler steps it takes, by the work in each
+    step. Dense engines multiply every species by every species each step, while sparse
+    engines only visit the edges
+    """
+    populations = trial.populations
+    species_count = len(populations.initial_populations)
+    edge_count = populations.get_sparse_coefficients().edge_count()
+    return trial.accuracy.iterations() * (species_count**2 + edge_count)
+
+
+class TrialSchedule:
+    """
+    The trials of the series being run, dispatched most expensive first so the threads
+    finish at about the same time rather than one of them running a large trial alone.
+    Not thread safe, it is guarded by the lock of ExecuteEpochs
+    """
+
+    ready: List[Tuple[int, int, int, int, SimulationTrial]]
+    """A heap of trials by descending cost, then by their series and index"""
+    undispatched: Dict[Tuple[int, int], int]
+    """How many trials of each series are waiting in 'ready'"""
+    unfinished: Dict[Tuple[int, int], int]
+    """How many trials of each series haven't finished running"""
+    generating: int
+    """How many series are having their trials generated"""
+
+    def __init__(self) -> None:
+        self.ready = []
+        self.undispatched = {}
+        self.unfinished = {}
+        self.generating = 0
+
+    def series_count(self) -> int:
+        """How many series are generating or have trials waiting to be dispatched"""
+        return self.generating + len(self.undispatched)
+
+    def start_generating(self) -> None:
+        self.generating += 1
+
+    def stop_generating(self) -> None:
+        """Generating a series failed, so it won't be added"""
+        self.generating -= 1
+
+    def add_series(
+        self,
+        series_id: SimulationSeriesId,
+        trials: List[SimulationTrial],
+        costs: List[int],
+    ) -> None:
+        """'costs' are estimated by estimate_trial_cost, outside of the lock"""
+        self.generating -= 1
+        if not trials:
+            return
+        key = (series_id.epoch, series_id.iteration)
+        self.undispatched[key] = len(trials)
+        self.unfinished[key] = len(trials)
+        for trial, cost in zip(trials, costs):
+            heapq.heappush(
+                self.ready,
+                (-cost, series_id.epoch, series_id.iteration, trial.index, trial),
+            )
+
+    def pop(self) -> SimulationTrial | None:
+        """The most expensive trial waiting to be dispatched"""
+        if not self.ready:
+            return None
+        trial = heapq.heappop(self.ready)[-1]
+        key = (trial.series_id.epoch, trial.series_id.iteration)
+        self.undispatched[key] -= 1
+        if self.undispatched[key] == 0:
+            del self.undispatched[key]
+        return trial
+
+    def trial_finished(self, trial: SimulationTrial) -> bool:
+        """If 'trial' was the last trial of its series to finish"""
+        key = (trial.series_id.epoch, trial.series_id.iteration)
+        self.unfinished[key] -= 1
+        if self.unfinished[key] > 0:
+            return False
+        del self.unfinished[key]
+        return True
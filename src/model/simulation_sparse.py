@@ -0,0 +1,15 @@
+from model.simulation_cpu import simulate_numpy
+from model.simulation_recorder import SimulationRecorder
+from model.simulation_trial import SimulationTrial, SparseCoefficients
+
+
+def simulate_sparse[R](
+    trial: SimulationTrial, recorder: SimulationRecorder[R] | None = None
+) -> R:
+    """
+    Same as simulate_cpu, but each step only visits the edges of the network.
+    Powerlaw and small world networks have O(n*m) edges, so this is much cheaper
+    than the dense O(n^2) dot product for large, loosely connected networks.
+    """
+    coefficients: SparseCoefficients = trial.populations.get_sparse_coefficients()
+    return simulate_numpy(trial, coefficients, recorder)
@@ -1,18 +1,112 @@
 import math
+from typing import List
 import numpy as np
 
 from model.simulation_series_id import SimulationSeriesId
 
+GENERATIONS_DTYPE = np.float64
+
+
+class SparseCoefficients:
+    """The non-zero coefficients of a network as an edge list sorted by row (CSR order)"""
+
+    rows: np.ndarray[int]
+    cols: np.ndarray[int]
+    weights: np.ndarray[float]
+    species_count: int
+
+    def __init__(
+        self, rows, cols, weights, species_count: int, is_sorted: bool = False
+    ) -> None:
+        if is_sorted:
+            # Kept as they are, so memory-mapped arrays aren't copied
+            self.rows, self.cols, self.weights = rows, cols, weights
+        else:
+            order = np.lexsort((cols, rows))
+            self.rows = np.asarray(rows, dtype=np.intp)[order]
+            self.cols = np.asarray(cols, dtype=np.intp)[order]
+            self.weights = np.asarray(weights, dtype=np.float64)[order]
+        self.species_count = species_count
+
+    @staticmethod
+    def from_dense(coefficients: np.ndarray) -> "SparseCoefficients":
+        coefficients = np.asarray(coefficients)
+        rows, cols = np.nonzero(coefficients)
+        return SparseCoefficients(
+            rows, cols, coefficients[rows, cols], len(coefficients)
+        )
+
+    def edge_count(self) -> int:
+        return len(self.weights)
+
+    def to_dense(self) -> np.ndarray[np.ndarray[float]]:
+        coefficients = np.zeros((self.species_count, self.species_count))
+        coefficients[self.rows, self.cols] = self.weights
+        return coefficients
+
+    def take(self, species: np.ndarray[int]) -> "SparseCoefficients":
+        """The coefficients between only the given species, renumbered in that order"""
+        renumber = np.full(self.species_count, -1, dtype=np.intp)
+        renumber[species] = np.arange(len(species))
+        rows = renumber[self.rows]
+        cols = renumber[self.cols]
+        kept = np.logical_and(rows != -1, cols != -1)
+        return SparseCoefficients(
+            rows[kept], cols[kept], self.weights[kept], len(species)
+        )
+
+    def dot(self, generation: np.ndarray[float]) -> np.ndarray[float]:
+        """Same as np.dot(coefficients, generation), but only visits the edges"""
+        return np.bincount(
+            self.rows,
+            weights=self.weights * generation[self.cols],
+            minlength=self.species_count,
+        )
+
 
 class SimulationPopulations:
     initial_populations: np.ndarray[float]
     growth_rates: np.ndarray[float]
-    coefficients: np.ndarray[np.ndarray[float]]
+    dense_coefficients: np.ndarray[np.ndarray[float]] | None
+    """Only built from the sparse coefficients once something needs the matrix"""
+    sparse_coefficients: SparseCoefficients | None
 
-    def __init__(self, initial_populations, growth_rates, coefficients) -> None:
+    def __init__(
+        self,
+        initial_populations,
+        growth_rates,
+        coefficients,
+        sparse_coefficients: SparseCoefficients | None = None,
+    ) -> None:
+        if coefficients is None and sparse_coefficients is None:
+            raise ValueError("Populations need either dense or sparse coefficients")
         self.initial_populations = initial_populations
         self.growth_rates = growth_rates
-        self.coefficients = coefficients
+        self.dense_coefficients = coefficients
+        self.sparse_coefficients = sparse_coefficients
+
+    @property
+    def coefficients(self) -> np.ndarray[np.ndarray[float]]:
+        # Shared by every trial of the same network, so only build it once
+        if self.dense_coefficients is None:
+            self.dense_coefficients = self.sparse_coefficients.to_dense()
+        return self.dense_coefficients
+
+    def built_coefficients(self) -> List[np.ndarray]:
+        """The coefficient arrays built so far, without building any others"""
+        arrays = []
+        if self.dense_coefficients is not None:
+            arrays.append(self.dense_coefficients)
+        if self.sparse_coefficients is not None:
+            sparse = self.sparse_coefficients
+            arrays += [sparse.rows, sparse.cols, sparse.weights]
+        return arrays
+
+    def get_sparse_coefficients(self) -> SparseCoefficients:
+        # Shared by every trial of the same network, so only build it once
+        if self.sparse_coefficients is None:
+            self.sparse_coefficients = SparseCoefficients.from_dense(self.coefficients)
+        return self.sparse_coefficients
 
 
 class SimulationAccuracy:
@@ -20,6 +114,15 @@ class SimulationAccuracy:
     max_time: int
     """How many timesteps should each simulation run for"""
     extinct_if_below: float
+    steady_state_tolerance: float
+    """
+    Stop early once no surviving species changes by more than this relative amount.
+    0 disables, so every simulation runs for the full max_time
+    """
+    integrator: str
+    """Either 'euler' for fixed euler steps, or 'adaptive' for adaptive Runge-Kutta steps"""
+    adaptive_rtol: float
+    adaptive_atol: float
 
     rounded_euler_step: float
 
@@ -29,10 +132,18 @@ class SimulationAccuracy:
         max_time: int = 200,
         extinct_if_below: float = 1e-10,
         goal_rounded_euler_step: float = 0.01,
+        steady_state_tolerance: float = 0.0,
+        integrator: str = "euler",
+        adaptive_rtol: float = 1e-6,
+        adaptive_atol: float = 1e-12,
     ) -> None:
         self.euler_step = euler_step
         self.max_time = max_time
         self.extinct_if_below = extinct_if_below
+        self.steady_state_tolerance = steady_state_tolerance
+        self.integrator = integrator
+        self.adaptive_rtol = adaptive_rtol
+        self.adaptive_atol = adaptive_atol
         self.goal_rounded_euler_step = goal_rounded_euler_step
         steps_in_rounded = max(1, math.ceil(goal_rounded_euler_step / euler_step))
         self.rounded_euler_step = steps_in_rounded * euler_step
@@ -79,3 +190,36 @@ class Generations(np.ndarray[Generation]):
 
 class FamilyLineage(np.ndarray[float]):
     pass
+
+
+class SimulationSurvival:
+    """How each species fared in a simulation, without keeping every generation"""
+
+    alive_generations: np.ndarray[int]
+    """How many rounded generations each species had a non-zero population for"""
+    final_populations: np.ndarray[float]
+    """The last rounded generation before the simulation ended or failed"""
+    failed_at: int
+    """The rounded generation the simulation went to infinity at, or -1 if it did not"""
+
+    def __init__(self, alive_generations, final_populations, failed_at: int) -> None:
+        self.alive_generations = alive_generations
+        self.final_populations = final_populations
+        self.failed_at = failed_at
+
+    def went_to_infinity(self) -> bool:
+        return self.failed_at != -1
+
+    @staticmethod
+    def from_generations(generations: Generations) -> "SimulationSurvival":
+        is_failed = np.any(generations == -1, axis=0)
+        failed_at = int(np.argmax(is_failed)) if np.any(is_failed) else -1
+        alive_generations = np.count_nonzero(
+            np.where(generations != -1, generations, 0), axis=1
+        )
+        if failed_at == 0:
+            final_populations = np.zeros(len(generations), dtype=GENERATIONS_DTYPE)
+        else:
+            last_t = failed_at - 1 if failed_at != -1 else -1
+            final_populations = np.array(generations[:, last_t])
+        return SimulationSurvival(alive_generations, final_populations, failed_at)
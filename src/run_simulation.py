@@ -1,62 +1,130 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future
+from threading import Lock
 from time import time
-from typing import Callable, List
+from typing import Callable, List, Set, Tuple
 
 from analyze.analyze import analyze_trial
 from config.parameters_api import ProgramParametersApi
+from env.program_env import program_env
 from model.simulation import SimulationSeries
-from model.simulation_trial import Generations, SimulationTrial
+from model.simulation_adaptive import simulate_adaptive
+from model.simulation_autotune import EngineAutotuner
+from model.simulation_engine import ENGINES, SimulationEngine
+from model.simulation_recorder import (
+    BlockRecorder,
+    SimulationRecorder,
+    SurvivalRecorder,
+)
+from model.simulation_series_id import SimulationSeriesId
+from model.simulation_trial import SimulationSurvival, SimulationTrial
 from store.entity.dparameters import DParameters
-from store.save.save_trial import save_trial
-from util.write_simulation import write_generations, write_meta_csv
+from store.init_db import connect_database
+from store.save.bulk_insert import entity_columns, insert_all
+from store.save.result_sink import ResultSink, TrialColumns
+from store.save.save_queue import SaveQueue, pending_trial_bytes
+from store.save.save_trial import create_run, trial_columns
+from util.write_simulation import GenerationsFileWriter, write_meta_csv
 
+ENGINE_NAMES: List[str] = ["auto", "autotune", *ENGINES]
 
-def choose_simulate_fn() -> Callable[[SimulationTrial], Generations]:
-    import numba.cuda
+if program_env.run.engine not in ENGINE_NAMES:
+    raise ValueError(
+        f"Unknown engine '{program_env.run.engine}', expected one of {ENGINE_NAMES}"
+    )
+
+type EngineChoice = Tuple[
+    Callable[[SimulationTrial], SimulationEngine], EngineAutotuner | None
+]
+"""How the engine of each trial is chosen, and the autotuner if it chooses them"""
 
-    if numba.cuda.is_available():
-        from model.simulation_gpu import simulate_gpu
 
+def choose_engine_fn() -> EngineChoice:
+    import numba.cuda
+
+    engine: str = program_env.run.engine
+    if engine == "auto":
+        engine = "gpu" if numba.cuda.is_available() else "jit"
+    if engine == "gpu":
         device = numba.cuda.get_current_device()
         compute_v = "v" + ".".join(map(str, device.compute_capability))
         print(f"Running program on device {device} with CUDA-Compute={compute_v}")
-        return simulate_gpu
-    else:
-        from model.simulation_cpu import simulate_cpu
-
+    elif engine == "sparse":
+        print("Running in CPU with sparse coefficients!")
+    elif engine == "cpu":
         print("Running in CPU! Performance will be impacted!")
-        return simulate_cpu
+    elif engine == "jit":
+        print(
+            "Running in CPU with a JIT compiled kernel! Performance will be impacted!"
+        )
+    elif engine == "batched":
+        print("Running in CPU with every trial of a series as one batch!")
 
+    if engine in ENGINES:
+        chosen: SimulationEngine = ENGINES[engine]
+        return (lambda trial: chosen), None
 
-simulate = choose_simulate_fn()
+    autotuner = EngineAutotuner.load_or_calibrate(program_env.run.calibration_file)
+    print("Running in CPU with the engine predicted to be fastest for each trial!")
+    return autotuner.choose, autotuner
 
-SHOULD_WRITE_SIMULATIONS: bool = False
 
+engine_choice: EngineChoice | None = None
+engine_choice_lock = Lock()
 
-simulation_save_executor = ThreadPoolExecutor(max_workers=2)
 
+def get_engine_choice() -> EngineChoice:
+    """Made when the first trial is run rather than on import, as it may calibrate"""
+    global engine_choice
+    with engine_choice_lock:
+        if engine_choice is None:
+            engine_choice = choose_engine_fn()
+        return engine_choice
 
-def save_and_analyze(
-    trial: SimulationTrial,
-    dparameters: DParameters,
-    generations: Generations,
-):
-    drun = save_trial(dparameters, trial, generations)
-    analyze_trial(dparameters, drun, trial, generations)
 
+def calibrate_before_workers() -> None:
+    """
+    Calibrates the autotuner in this process, so worker processes load the calibration
+    rather than each measuring it at once
+    """
+    if program_env.run.engine == "autotune":
+        get_engine_choice()
+
+
+def choose_engine(trial: SimulationTrial) -> SimulationEngine:
+    return get_engine_choice()[0](trial)
 
-def run_trial(
-    trial: SimulationTrial,
-    dparameters: DParameters,
-    config: ProgramParametersApi,
-    trial_identifier: str,
-):
-    generations: Generations = simulate(trial)
 
-    simulation_save_executor.submit(save_and_analyze, trial, dparameters, generations)
+def should_batch(euler_trials: List[SimulationTrial]) -> bool:
+    """If the euler trials of a series are run together as one batch"""
+    if program_env.run.batch_trials:
+        return True
+    _, autotuner = get_engine_choice()
+    if autotuner is None:
+        return program_env.run.engine == "batched"
+    return autotuner.prefers_batch(euler_trials)
 
+
+def choose_trial_engine(trial: SimulationTrial) -> SimulationEngine:
+    if program_env.run.batch_trials:
+        return ENGINES["batched"]
+    return choose_engine(trial)
+
+
+def simulate[R](trial: SimulationTrial, recorder: SimulationRecorder[R]) -> R:
+    if trial.accuracy.integrator == "adaptive":
+        return simulate_adaptive(trial, recorder)
+    return choose_trial_engine(trial).simulate(trial, recorder)
+
+
+SHOULD_WRITE_SIMULATIONS: bool = False
+
+
+def create_recorder(
+    trial: SimulationTrial, config: ProgramParametersApi, trial_identifier: str
+) -> SimulationRecorder[SimulationSurvival]:
+    """Generations are only kept a block at a time, while they are written to a file"""
     if not SHOULD_WRITE_SIMULATIONS:
-        return
+        return SurvivalRecorder(trial)
 
     seed = config.master_seed.uuid
     prefix = f"run/{seed}/"
@@ -70,26 +138,176 @@ def run_trial(
         edges_file,
     )
     file = f"{prefix}{trial_identifier}_generations_{seed}.csv"
-    write_generations(generations, file)
+    species_count = len(trial.populations.initial_populations)
+    writer = GenerationsFileWriter(
+        file, species_count, trial.accuracy.rounded_iterations()
+    )
+    return BlockRecorder(trial, writer)
+
+
+simulation_save_queue = SaveQueue(
+    program_env.run.save_threads,
+    program_env.run.save_max_pending_trials,
+    program_env.run.save_max_pending_bytes,
+    program_env.database_conn().is_single_writer(),
+)
+
+simulation_result_sink: ResultSink | None = None
+if program_env.run.result_sink:
+    simulation_result_sink = ResultSink(
+        program_env.run.result_sink_flush_trials,
+        program_env.run.result_sink_flush_seconds,
+        program_env.run.save_max_pending_trials,
+    )
+
+
+def analyzed_columns(
+    trial: SimulationTrial,
+    dparameters: DParameters,
+    survival: SimulationSurvival,
+) -> TrialColumns:
+    """Every row saved for a trial, its analysis included"""
+    drun = create_run(trial, dparameters)
+    analysis = analyze_trial(dparameters, drun, trial, survival)
+    return trial_columns(drun, trial, survival) + entity_columns(analysis)
 
 
-def progress(config, epoch, iteration, trial, trials, duration):
+def run_trial(
+    trial: SimulationTrial,
+    dparameters: DParameters,
+    config: ProgramParametersApi,
+    trial_identifier: str,
+) -> Future:
+    recorder = create_recorder(trial, config, trial_identifier)
+    survival: SimulationSurvival = simulate(trial, recorder)
+    return finish_trial(trial, dparameters, survival)
+
+
+def finish_trial(
+    trial: SimulationTrial,
+    dparameters: DParameters,
+    survival: SimulationSurvival,
+) -> Future:
+    # Analyzed before it's queued, as analyzing may save new column names, which
+    # can't be committed while a writer holds the database's lock
+    columns = analyzed_columns(trial, dparameters, survival)
+    if simulation_result_sink is not None:
+        return simulation_result_sink.add(columns)
+    return simulation_save_queue.submit(
+        pending_trial_bytes(trial, survival), insert_all, columns
+    )
+
+
+def progress(config, epoch, iteration, trial, trial_count, duration):
     epoch_progress = f"epoch {epoch}/{config.epochs.epochs-1}"
     iteration_progress = f"iter {iteration}/{config.epochs.iterations-1}"
-    trial_progress = f"trial {trial.index}/{len(trials)-1}"
+    trial_progress = f"trial {trial.index}/{trial_count-1}"
     print(
         f"Took {round(duration,3)} to run {epoch_progress}, {iteration_progress}, {trial_progress}"
     )
 
 
-def run_simulation(config, dparameters, series_id):
-    simulation: SimulationSeries = SimulationSeries(config, series_id)
-    trials: List[SimulationTrial] = simulation.iteration_generate_trials()
+def get_trial_identifier(series_id, trial: SimulationTrial) -> str:
+    return f"{series_id.epoch:04d}ep-{series_id.iteration:04d}s-{trial.index:04d}t"
+
+
+def run_batched(
+    config, dparameters, series_id, trials: List[SimulationTrial]
+) -> List[Future]:
+    start = time()
+    # Only fixed euler steps can be run in lockstep
+    batched_trials = [t for t in trials if t.accuracy.integrator == "euler"]
+    other_trials = [t for t in trials if t.accuracy.integrator != "euler"]
+
+    def recorder_for(trial: SimulationTrial) -> SimulationRecorder[SimulationSurvival]:
+        return create_recorder(trial, config, get_trial_identifier(series_id, trial))
+
+    recorders = [recorder_for(trial) for trial in batched_trials]
+    survivals = ENGINES["batched"].simulate_all(batched_trials, recorders)
+    survivals += [simulate(trial, recorder_for(trial)) for trial in other_trials]
+    saves: List[Future] = []
+    for trial, survival in zip(batched_trials + other_trials, survivals):
+        saves.append(finish_trial(trial, dparameters, survival))
+    duration = time() - start
+    print(
+        f"Took {round(duration,3)} to run epoch {series_id.epoch}/{config.epochs.epochs-1}, "
+        + f"iter {series_id.iteration}/{config.epochs.iterations-1} as a batch of {len(trials)} trials"
+    )
+    return saves
+
+
+def run_simulation(
+    config,
+    dparameters,
+    series_id,
+    trials: List[SimulationTrial] | None = None,
+    saved_trials: Set[int] = frozenset(),
+) -> List[Future]:
+    """
+    Returns the pending save of every trial in the series.
+    The trials are generated here unless they were already generated, such as prefetched.
+    Trials whose index is in 'saved_trials' were saved by an earlier run, so are skipped
+    """
+    if trials is None:
+        simulation: SimulationSeries = SimulationSeries(config, series_id)
+        trials = simulation.iteration_generate_trials()
+    trials = [trial for trial in trials if trial.index not in saved_trials]
+    euler_trials = [t for t in trials if t.accuracy.integrator == "euler"]
+    if euler_trials and should_batch(euler_trials):
+        return run_batched(config, dparameters, series_id, trials)
+
+    saves: List[Future] = []
     for trial in trials:
-        trial_identifier = (
-            f"{series_id.epoch:04d}ep-{series_id.iteration:04d}s-{trial.index:04d}t"
-        )
+        trial_identifier = get_trial_identifier(series_id, trial)
         start = time()
-        run_trial(trial, dparameters, config, trial_identifier)
+        saves.append(run_trial(trial, dparameters, config, trial_identifier))
         duration = time() - start
-        progress(config, series_id.epoch, series_id.iteration, trial, trials, duration)
+        progress(
+            config, series_id.epoch, series_id.iteration, trial, len(trials), duration
+        )
+    return saves
+
+
+def run_scheduled_trial(
+    config, dparameters, trial: SimulationTrial, trial_count: int
+) -> Future:
+    """
+    Runs one trial of a series on its own, for when the trials of many series are
+    scheduled together. Returns its pending save
+    """
+    series_id = trial.series_id
+    trial_identifier = get_trial_identifier(series_id, trial)
+    start = time()
+    save = run_trial(trial, dparameters, config, trial_identifier)
+    duration = time() - start
+    progress(config, series_id.epoch, series_id.iteration, trial, trial_count, duration)
+    return save
+
+
+process_config: ProgramParametersApi = None
+process_dparameters: DParameters = None
+
+
+def init_process_worker(config: ProgramParametersApi, dparameters: DParameters):
+    """Runs once in each worker process, which needs its own database engine"""
+    global process_config, process_dparameters
+    connect_database()
+    process_config = config
+    process_dparameters = dparameters
+
+
+def run_simulation_in_process(
+    series_id: SimulationSeriesId, saved_trials: Set[int] = frozenset()
+) -> None:
+    """
+    Runs a series in a worker process. Its saves are waited on so any error is raised
+    back to the coordinating process with the series that caused it
+    """
+    saves = run_simulation(
+        process_config, process_dparameters, series_id, saved_trials=saved_trials
+    )
+    if simulation_result_sink is not None:
+        # Nothing else is added while this waits, so there's nothing to batch with
+        simulation_result_sink.flush()
+    for save in saves:
+        save.result()
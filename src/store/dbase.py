@@ -12,7 +12,8 @@ class DB:
         return Session(self.engine)
 
     def save(self, obj: object) -> None:
-        with self.sess() as sess:
+        """Saves 'obj', which stays readable once its session is closed"""
+        with Session(self.engine, expire_on_commit=False) as sess:
             sess.add(obj)
             sess.commit()
 
@@ -1,10 +1,12 @@
-from typing import Optional
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID, uuid4
 
-from sqlalchemy import TEXT, VARCHAR, Uuid, select
+from sqlalchemy import TEXT, VARCHAR, Uuid, select, update
 from sqlalchemy.orm import Mapped, mapped_column
 
 from store.dbase import Base, db
+from store.save.bulk_insert import insert_ignoring_conflicts
 
 
 class DAnalysisColumnName(Base):
@@ -20,34 +22,87 @@ class DAnalysisColumnName(Base):
         self.description = description
 
 
-def __verify_cname(
-    q, id: Optional[UUID], name: str, description: str
-) -> DAnalysisColumnName:
-    with db.sess() as sess:
-        cname: DAnalysisColumnName | None = sess.execute(q).one_or_none()
-        if cname is not None:
-            cname = cname[0]
-            if cname.description == description and cname.name == name:
-                return cname
-            cname.name = name
-            cname.description = description
-        else:
-            cname = DAnalysisColumnName(id, name, description)
-        sess.add(cname)
-        sess.commit()
-        return cname
-
-
-def get_column(
-    name: str, description: Optional[str] = None, id: Optional[UUID] = None
-) -> DAnalysisColumnName:
-    if id is None:
-        q = (
-            select(DAnalysisColumnName)
-            .where(DAnalysisColumnName.name.ilike(name))
-            .limit(1)
+class ColumnNames:
+    """
+    Every column name and its id, loaded once and then resolved in memory, so saving
+    a trial doesn't query them. Names are matched ignoring case
+    """
+
+    ids: Dict[str, UUID] | None
+    """The id of each lowercased name, None until loaded"""
+    descriptions: Dict[str, Optional[str]]
+
+    def __init__(self) -> None:
+        self.ids = None
+        self.descriptions = {}
+        self.lock = Lock()
+
+    def _load(self) -> None:
+        q = select(
+            DAnalysisColumnName.id,
+            DAnalysisColumnName.name,
+            DAnalysisColumnName.description,
         )
-    else:
-        q = select(DAnalysisColumnName).where(DAnalysisColumnName.id == id)
+        with db.sess() as sess:
+            rows = sess.execute(q).all()
+        self.ids = {name.lower(): id for id, name, _ in rows}
+        self.descriptions = {name.lower(): description for _, name, description in rows}
+
+    def get_id(self, name: str, description: Optional[str] = None) -> UUID:
+        return self.get_ids([(name, description)])[0]
+
+    def get_ids(self, columns: List[Tuple[str, Optional[str]]]) -> List[UUID]:
+        """The id of each (name, description), creating the missing ones together"""
+        with self.lock:
+            if self.ids is None:
+                self._load()
+            missing = {}
+            outdated = {}
+            for name, description in columns:
+                key = name.lower()
+                if key not in self.ids:
+                    missing[key] = (name, description)
+                elif description is not None and self.descriptions[key] != description:
+                    outdated[key] = description
+            if missing:
+                self._create(list(missing.values()))
+            if outdated:
+                self._describe(outdated)
+            return [self.ids[name.lower()] for name, _ in columns]
+
+    def _create(self, columns: List[Tuple[str, Optional[str]]]) -> None:
+        rows = [
+            {"id": uuid4(), "name": name, "description": description}
+            for name, description in columns
+        ]
+        names = [name for name, _ in columns]
+        with db.sess() as sess:
+            # Another process may create the same names first, its ids are kept
+            insert_ignoring_conflicts(sess, DAnalysisColumnName, rows, ["name"])
+            sess.commit()
+            q = select(
+                DAnalysisColumnName.id,
+                DAnalysisColumnName.name,
+                DAnalysisColumnName.description,
+            ).where(DAnalysisColumnName.name.in_(names))
+            for id, name, description in sess.execute(q).all():
+                self.ids[name.lower()] = id
+                self.descriptions[name.lower()] = description
+
+    def _describe(self, descriptions: Dict[str, str]) -> None:
+        with db.sess() as sess:
+            for key, description in descriptions.items():
+                sess.execute(
+                    update(DAnalysisColumnName)
+                    .where(DAnalysisColumnName.id == self.ids[key])
+                    .values(description=description)
+                )
+                self.descriptions[key] = description
+            sess.commit()
+
+
+column_names = ColumnNames()
+
 
-    return __verify_cname(q, id, name, description)
+def get_column_id(name: str, description: Optional[str] = None) -> UUID:
+    return column_names.get_id(name, description)
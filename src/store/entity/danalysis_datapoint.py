@@ -19,9 +19,10 @@ class DAnalysisDatapoint(Base):
     run: Mapped[DRun] = relationship(foreign_keys=run_id)
     value: Mapped[float] = mapped_column(Double())
 
-    def __init__(self, run: DRun, column: DAnalysisColumnName, value: float):
-        self.cname = column
-        self.run = run
+    def __init__(self, run: DRun, cname_id: UUID, value: float):
+        # Set by id rather than relationship, so neither has to be in the session
+        self.cname_id = cname_id
+        self.run_id = run.id
         self.value = value
 
     @declared_attr.directive
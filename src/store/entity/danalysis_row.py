@@ -0,0 +1,69 @@
+from threading import Lock
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import JSON, ForeignKey, LargeBinary, Uuid
+from sqlalchemy.orm import Mapped, mapped_column
+
+from store.dbase import Base, db
+from store.entity.drun import DRun
+from store.save.bulk_insert import insert_ignoring_conflicts
+from util.hashing import hash_digest
+
+ANALYSIS_VALUES_DTYPE = np.dtype("<f8")
+
+
+class DAnalysisSchema(Base):
+    """The order of the columns packed into the values of an analysis row"""
+
+    __tablename__ = "analysis_schema"
+    id: Mapped[UUID] = mapped_column(Uuid(), primary_key=True)
+    """Derived from the column ids, so every process gives a schema the same id"""
+    cname_ids: Mapped[object] = mapped_column(JSON(), nullable=False)
+    """The id of each column, in the order their values are packed"""
+
+
+class DAnalysisRow(Base):
+    """Every analysis datapoint of a run in one row, rather than a row for each"""
+
+    __tablename__ = "analysis_row"
+    run_id: Mapped[UUID] = mapped_column(ForeignKey(DRun.id), primary_key=True)
+    schema_id: Mapped[UUID] = mapped_column(ForeignKey(DAnalysisSchema.id), index=True)
+    values: Mapped[bytes] = mapped_column(LargeBinary(), nullable=False)
+    """The value of each column of the schema, as little endian float64"""
+
+    def __init__(self, run: DRun, schema_id: UUID, values: List[float]) -> None:
+        self.run_id = run.id
+        self.schema_id = schema_id
+        self.values = np.asarray(values, dtype=ANALYSIS_VALUES_DTYPE).tobytes()
+
+
+def unpack_values(values: bytes) -> np.ndarray[float]:
+    return np.frombuffer(values, dtype=ANALYSIS_VALUES_DTYPE)
+
+
+class AnalysisSchemas:
+    """The id of each schema saved by this process, so each is only saved once"""
+
+    ids: Dict[Tuple[UUID, ...], UUID]
+
+    def __init__(self) -> None:
+        self.ids = {}
+        self.lock = Lock()
+
+    def get_id(self, cname_ids: Tuple[UUID, ...]) -> UUID:
+        with self.lock:
+            if cname_ids in self.ids:
+                return self.ids[cname_ids]
+            digest = hash_digest(b"".join(id.bytes for id in cname_ids))
+            schema_id = UUID(bytes=digest[:16])
+            row = {"id": schema_id, "cname_ids": [str(id) for id in cname_ids]}
+            with db.sess() as sess:
+                insert_ignoring_conflicts(sess, DAnalysisSchema, [row], ["id"])
+                sess.commit()
+            self.ids[cname_ids] = schema_id
+            return schema_id
+
+
+analysis_schemas = AnalysisSchemas()
@@ -0,0 +1,56 @@
+import zlib
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import ForeignKey, Integer, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+
+from model.simulation_trial import SparseCoefficients
+from store.dbase import Base
+from store.entity.drun import DRun
+
+WEIGHTS_DTYPE = np.dtype("<f8")
+
+
+def _index_dtype(species_count: int) -> np.dtype:
+    return np.dtype("<u2") if species_count <= 2**16 else np.dtype("<u4")
+
+
+class DCoefficientsBlob(Base):
+    """
+    Every non-zero coefficient of a run as one compressed blob, rather than a row in
+    'coefficients' for each pair of species. The blob holds the rows, then the columns,
+    then the weights of the coefficients in COO order
+    """
+
+    __tablename__ = "coefficients_blob"
+    run_id: Mapped[UUID] = mapped_column(ForeignKey(DRun.id), primary_key=True)
+    species_count: Mapped[int] = mapped_column(Integer(), nullable=False)
+    edge_count: Mapped[int] = mapped_column(Integer(), nullable=False)
+    coefficients: Mapped[bytes] = mapped_column(LargeBinary(), nullable=False)
+
+
+def pack_coefficients(sparse: SparseCoefficients) -> bytes:
+    index_dtype = _index_dtype(sparse.species_count)
+    data = b"".join(
+        [
+            sparse.rows.astype(index_dtype).tobytes(),
+            sparse.cols.astype(index_dtype).tobytes(),
+            sparse.weights.astype(WEIGHTS_DTYPE).tobytes(),
+        ]
+    )
+    return zlib.compress(data)
+
+
+def unpack_coefficients(
+    blob: bytes, species_count: int, edge_count: int
+) -> SparseCoefficients:
+    data = zlib.decompress(blob)
+    index_dtype = _index_dtype(species_count)
+    index_bytes = edge_count * index_dtype.itemsize
+    rows = np.frombuffer(data, dtype=index_dtype, count=edge_count)
+    cols = np.frombuffer(data, dtype=index_dtype, count=edge_count, offset=index_bytes)
+    weights = np.frombuffer(
+        data, dtype=WEIGHTS_DTYPE, count=edge_count, offset=2 * index_bytes
+    )
+    return SparseCoefficients(rows, cols, weights, species_count)
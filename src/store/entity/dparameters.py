@@ -1,4 +1,4 @@
-from base64 import b64encode
+from base64 import b64decode, b64encode
 from datetime import datetime
 from typing import Optional
 from uuid import UUID, uuid4
@@ -12,11 +12,13 @@ from sqlalchemy import (
     UniqueConstraint,
     Uuid,
     func,
+    select,
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Mapped, declared_attr, mapped_column
 
 from env.program_env import program_env
-from store.dbase import Base
+from store.dbase import Base, db
 from util.hashing import hash_digest
 from util.json_utils import json_dumps
 
@@ -59,3 +61,36 @@ class DParameters(Base):
 
         digest = hash_digest(seed.bytes, parameters_json)
         self.hash = b64encode(digest).decode("ascii")
+
+
+def find_saved_parameters(dparameters: DParameters) -> DParameters | None:
+    """The most recently started run with the same seed and parameters, if any"""
+    return _find_parameters_by_hash(dparameters.hash)
+
+
+def _find_parameters_by_hash(parameters_hash: str) -> DParameters | None:
+    q = (
+        select(DParameters)
+        .where(DParameters.hash == parameters_hash)
+        .order_by(DParameters.start_date.desc())
+        .limit(1)
+    )
+    with db.sess() as sess:
+        return sess.execute(q).scalar_one_or_none()
+
+
+def get_or_save_parameters(dparameters: DParameters) -> DParameters:
+    """The saved run with the same seed and parameters, saving 'dparameters' if none"""
+    saved = find_saved_parameters(dparameters)
+    if saved is not None:
+        return saved
+    # Read first, as saving expires the attributes of 'dparameters'
+    parameters_hash = dparameters.hash
+    # Derived from the hash, so workers of the same run saving it at once conflict
+    # rather than each saving their own
+    dparameters.id = UUID(bytes=b64decode(parameters_hash)[:16])
+    try:
+        db.save(dparameters)
+    except IntegrityError:
+        pass
+    return _find_parameters_by_hash(parameters_hash)
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import (
+    TIMESTAMP,
+    VARCHAR,
+    Boolean,
+    ForeignKey,
+    Integer,
+    PrimaryKeyConstraint,
+)
+from sqlalchemy.orm import Mapped, declared_attr, mapped_column
+
+from store.dbase import Base
+from store.entity.dparameters import DParameters
+
+
+class DSeriesLease(Base):
+    """
+    Claims an epoch of series for one worker, so workers on many hosts can share a run.
+    A lease that isn't heartbeated before it expires is free to be claimed again
+    """
+
+    __tablename__ = "series_lease"
+
+    parameters_id: Mapped[UUID] = mapped_column(ForeignKey(DParameters.id))
+    epoch: Mapped[int] = mapped_column(Integer(), nullable=False)
+    owner: Mapped[Optional[str]] = mapped_column(VARCHAR(255), nullable=True)
+    """The worker holding the lease, None if it was never claimed"""
+    heartbeat: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(), nullable=True)
+    """The last time the owner showed it is alive, in UTC"""
+    completed: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=False)
+
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (PrimaryKeyConstraint("parameters_id", "epoch"),)
@@ -1,6 +1,7 @@
 import sys
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError, IntegrityError
 
 from env.program_env import program_env, program_env_file
 from store.dbase import Base, db
@@ -8,16 +9,22 @@ from util.json_utils import json_dumps
 
 
 def connect_database():
-    db.engine = create_engine(
-        program_env.database_conn().url(),
-        json_serializer=json_dumps,
+    conn = program_env.database_conn()
+    db.engine = create_engine(conn.url(), json_serializer=json_dumps)
+    event.listen(
+        db.engine,
+        "connect",
+        lambda dbapi_connection, _: conn.on_connect(dbapi_connection),
     )
     from store.entity import (
         danalysis_cname,
         danalysis_datapoint,
+        danalysis_row,
         dcoefficients,
+        dcoefficients_blob,
         dparameters,
         drun,
+        dseries_lease,
         dspecies_run,
     )
 
@@ -40,9 +47,28 @@ def confirm_delete_db():
         sys.exit(0)
 
 
+def create_schema():
+    """
+    Creates whichever tables are missing. Another process starting on the same database
+    may be creating them at the same time, in which case creating what is still missing
+    is retried. Each retry follows a table or index the other process made, which bounds
+    how many there can be
+    """
+    attempts = 1 + sum(1 + len(table.indexes) for table in Base.metadata.sorted_tables)
+    for attempt in range(attempts):
+        try:
+            Base.metadata.create_all(bind=db.engine, checkfirst=True)
+            return
+        except DBAPIError as e:
+            # Postgres may report the race as a duplicate key in its catalog instead
+            is_concurrent = "already exists" in str(e) or isinstance(e, IntegrityError)
+            if not is_concurrent or attempt == attempts - 1:
+                raise
+
+
 def init_db():
     connect_database()
 
     if program_env.CONFIRM_DROP_DATABASE_ONCE:
         confirm_delete_db()
-    Base.metadata.create_all(bind=db.engine)
+    create_schema()
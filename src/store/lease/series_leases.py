@@ -0,0 +1,180 @@
+import socket
+from datetime import datetime, timedelta, timezone
+from os import getpid
+from threading import Event, Lock, Thread
+from traceback import print_exception
+from typing import Dict, List, Set
+from uuid import uuid4
+
+from sqlalchemy import or_, select, update
+
+from store.dbase import db
+from store.entity.dparameters import DParameters
+from store.entity.dseries_lease import DSeriesLease
+from store.save.bulk_insert import insert_ignoring_conflicts
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class SeriesLeases:
+    """
+    Claims epochs of a run from the lease table, heartbeating every epoch it holds until
+    each of its series is finished. Workers on other hosts claim the other epochs.
+    Heartbeats are compared across hosts, so their clocks should be synchronized
+    """
+
+    dparameters: DParameters
+    owner: str
+    timeout: timedelta
+    """How long since its last heartbeat before a lease can be claimed by another worker"""
+    heartbeat_seconds: float
+    running: Dict[int, int]
+    """How many series of each held epoch are running"""
+    claiming: Set[int]
+    """Held epochs that may still have series to start"""
+
+    def __init__(
+        self,
+        dparameters: DParameters,
+        timeout_seconds: float,
+        heartbeat_seconds: float,
+    ) -> None:
+        self.dparameters = dparameters
+        self.owner = f"{socket.gethostname()}-{getpid()}-{uuid4().hex[:8]}"
+        self.timeout = timedelta(seconds=timeout_seconds)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.running = {}
+        self.claiming = set()
+        self.lock = Lock()
+        self.stopped = Event()
+        self.heartbeat_thread = Thread(target=self._heartbeat_loop, daemon=True)
+
+    def create_leases(self, first_epoch: int, max_epochs: int) -> None:
+        """Adds a lease for every epoch of the run, unless another worker already has"""
+        parameters_id = self.dparameters.id
+        with db.sess() as sess:
+            q = select(DSeriesLease.epoch).where(
+                DSeriesLease.parameters_id == parameters_id
+            )
+            existing = set(sess.scalars(q).all())
+            missing = [
+                {"parameters_id": parameters_id, "epoch": epoch, "completed": False}
+                for epoch in range(first_epoch, max_epochs + 1)
+                if epoch not in existing
+            ]
+            if not missing:
+                return
+            # Another worker may be creating the same leases at the same time
+            insert_ignoring_conflicts(
+                sess, DSeriesLease, missing, ["parameters_id", "epoch"]
+            )
+            sess.commit()
+
+    def claim(self) -> int | None:
+        """The earliest epoch that isn't held or completed, None once there are none"""
+        while True:
+            now = utc_now()
+            claimable = (
+                DSeriesLease.parameters_id == self.dparameters.id,
+                DSeriesLease.completed.is_(False),
+                or_(
+                    DSeriesLease.owner.is_(None),
+                    DSeriesLease.heartbeat < now - self.timeout,
+                ),
+            )
+            with db.sess() as sess:
+                # Skip locked lets Postgres workers claim different epochs at once
+                q = (
+                    select(DSeriesLease.epoch)
+                    .where(*claimable)
+                    .order_by(DSeriesLease.epoch)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                epoch = sess.execute(q).scalar_one_or_none()
+                if epoch is None:
+                    return None
+                # Conditional, as SQLite can't lock the row that was selected
+                claimed = sess.execute(
+                    update(DSeriesLease)
+                    .where(*claimable, DSeriesLease.epoch == epoch)
+                    .values(owner=self.owner, heartbeat=now)
+                    .execution_options(synchronize_session=False)
+                )
+                sess.commit()
+            if claimed.rowcount == 1:
+                break
+
+        with self.lock:
+            self.running[epoch] = 0
+            self.claiming.add(epoch)
+            if self.heartbeat_thread.ident is None:
+                self.heartbeat_thread.start()
+        return epoch
+
+    def series_started(self, epoch: int) -> None:
+        with self.lock:
+            self.running[epoch] += 1
+
+    def epoch_started(self, epoch: int) -> None:
+        """Every series of 'epoch' that will be run has been started"""
+        with self.lock:
+            self.claiming.discard(epoch)
+            is_finished = self.running[epoch] == 0
+            if is_finished:
+                del self.running[epoch]
+        if is_finished:
+            self._complete(epoch)
+
+    def series_finished(self, epoch: int) -> None:
+        with self.lock:
+            self.running[epoch] -= 1
+            is_finished = self.running[epoch] == 0 and epoch not in self.claiming
+            if is_finished:
+                del self.running[epoch]
+        if is_finished:
+            self._complete(epoch)
+
+    def _complete(self, epoch: int) -> None:
+        with db.sess() as sess:
+            sess.execute(
+                update(DSeriesLease)
+                .where(
+                    DSeriesLease.parameters_id == self.dparameters.id,
+                    DSeriesLease.epoch == epoch,
+                )
+                .values(completed=True)
+                .execution_options(synchronize_session=False)
+            )
+            sess.commit()
+
+    def _heartbeat_loop(self) -> None:
+        while not self.stopped.wait(self.heartbeat_seconds):
+            with self.lock:
+                held = list(self.running.keys())
+            if not held:
+                continue
+            try:
+                self._heartbeat(held)
+            except Exception as e:
+                # Missing a heartbeat is fine, as long as the next one isn't too late
+                print_exception(e)
+
+    def _heartbeat(self, held: List[int]) -> None:
+        with db.sess() as sess:
+            sess.execute(
+                update(DSeriesLease)
+                .where(
+                    DSeriesLease.parameters_id == self.dparameters.id,
+                    DSeriesLease.epoch.in_(held),
+                    DSeriesLease.owner == self.owner,
+                )
+                .values(heartbeat=utc_now())
+                .execution_options(synchronize_session=False)
+            )
+            sess.commit()
+
+    def stop(self) -> None:
+        self.stopped.set()
@@ -0,0 +1,103 @@
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from model.simulation_series_id import SimulationSeriesId
+from store.dbase import db
+from store.entity.dparameters import DParameters
+from store.entity.drun import DRun
+from util.hashing import hash_digest_json
+
+
+class CompletedSeries:
+    """Which series of a run were already saved, such as before a restart"""
+
+    completed: np.ndarray[np.ndarray[bool]]
+    """If every trial of a series is saved, by epoch then iteration"""
+    saved_trials: Dict[Tuple[int, int], Set[int]]
+    """The trial indexes saved of each series that was only partly saved"""
+
+    def __init__(self, max_epochs: int, max_iteration: int) -> None:
+        self.completed = np.zeros((max_epochs + 1, max_iteration), dtype=bool)
+        self.saved_trials = {}
+
+    def is_complete(self, series_id: SimulationSeriesId) -> bool:
+        return bool(self.completed[series_id.epoch, series_id.iteration])
+
+    def get_saved_trials(self, series_id: SimulationSeriesId) -> Set[int]:
+        return self.saved_trials.get((series_id.epoch, series_id.iteration), set())
+
+    def completed_count(self) -> int:
+        return int(np.count_nonzero(self.completed))
+
+
+def load_completed_series(
+    dparameters: DParameters,
+    series_ids: Iterable[SimulationSeriesId],
+    max_epochs: int,
+    max_iteration: int,
+    trials_per_series: int,
+) -> CompletedSeries:
+    """
+    Counts the saved trials of every series in one query. Runs only store the hash of
+    their series, so it is matched by hashing each series of 'series_ids'
+    """
+    q = (
+        select(DRun.series_hash, func.count(DRun.trial_index))
+        .where(DRun.parameters_id == dparameters.id)
+        .group_by(DRun.series_hash)
+    )
+    with db.sess() as sess:
+        saved_counts: Dict[str, int] = dict(sess.execute(q).all())
+
+    completed = CompletedSeries(max_epochs, max_iteration)
+    partial_hashes: Dict[str, Tuple[int, int]] = {}
+    for series_id in series_ids:
+        if not saved_counts:
+            break
+        series_hash = hash_digest_json(series_id)
+        saved_count = saved_counts.pop(series_hash, 0)
+        if saved_count >= trials_per_series:
+            completed.completed[series_id.epoch, series_id.iteration] = True
+        elif saved_count > 0:
+            partial_hashes[series_hash] = (series_id.epoch, series_id.iteration)
+
+    if partial_hashes:
+        q = select(DRun.series_hash, DRun.trial_index).where(
+            DRun.parameters_id == dparameters.id,
+            DRun.series_hash.in_(partial_hashes.keys()),
+        )
+        with db.sess() as sess:
+            for series_hash, trial_index in sess.execute(q).all():
+                key = partial_hashes[series_hash]
+                completed.saved_trials.setdefault(key, set()).add(trial_index)
+    return completed
+
+
+def load_saved_series(
+    completed: CompletedSeries,
+    dparameters: DParameters,
+    series_ids: List[SimulationSeriesId],
+    trials_per_series: int,
+) -> None:
+    """Adds which of 'series_ids' were saved, querying only their runs"""
+    series_of_hash = {
+        hash_digest_json(series_id): (series_id.epoch, series_id.iteration)
+        for series_id in series_ids
+    }
+    q = select(DRun.series_hash, DRun.trial_index).where(
+        DRun.parameters_id == dparameters.id,
+        DRun.series_hash.in_(series_of_hash.keys()),
+    )
+    saved_trials: Dict[Tuple[int, int], Set[int]] = {}
+    with db.sess() as sess:
+        for series_hash, trial_index in sess.execute(q).all():
+            key = series_of_hash[series_hash]
+            saved_trials.setdefault(key, set()).add(trial_index)
+
+    for key, trials in saved_trials.items():
+        if len(trials) >= trials_per_series:
+            completed.completed[key] = True
+        else:
+            completed.saved_trials[key] = trials
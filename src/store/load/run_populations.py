@@ -0,0 +1,67 @@
+from typing import Dict, Iterable, List
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+
+from model.simulation_trial import SimulationPopulations, SparseCoefficients
+from store.dbase import db
+from store.entity.dcoefficients_blob import DCoefficientsBlob, unpack_coefficients
+from store.entity.dspecies_run import DSpeciesRun
+
+LOAD_CHUNK_SIZE = 500
+"""How many runs are loaded by each query, to keep their IN lists small"""
+
+
+def _chunks(run_ids: Iterable[UUID]) -> Iterable[List[UUID]]:
+    run_ids = list(run_ids)
+    for start in range(0, len(run_ids), LOAD_CHUNK_SIZE):
+        yield run_ids[start : start + LOAD_CHUNK_SIZE]
+
+
+def load_run_coefficients(run_ids: Iterable[UUID]) -> Dict[UUID, SparseCoefficients]:
+    """The coefficients of each run saved as a blob, unpacked a chunk of runs at a time"""
+    coefficients = {}
+    with db.sess() as sess:
+        for chunk in _chunks(run_ids):
+            q = select(
+                DCoefficientsBlob.run_id,
+                DCoefficientsBlob.species_count,
+                DCoefficientsBlob.edge_count,
+                DCoefficientsBlob.coefficients,
+            ).where(DCoefficientsBlob.run_id.in_(chunk))
+            for run_id, species_count, edge_count, blob in sess.execute(q).all():
+                coefficients[run_id] = unpack_coefficients(
+                    blob, species_count, edge_count
+                )
+    return coefficients
+
+
+def load_run_populations(
+    run_ids: Iterable[UUID],
+) -> Dict[UUID, SimulationPopulations]:
+    """Rebuilds the network each run simulated, for runs with their coefficients in a blob"""
+    run_ids = list(run_ids)
+    coefficients = load_run_coefficients(run_ids)
+    species: Dict[UUID, List[tuple]] = {}
+    with db.sess() as sess:
+        for chunk in _chunks(coefficients.keys()):
+            q = (
+                select(
+                    DSpeciesRun.run_id,
+                    DSpeciesRun.initial_population,
+                    DSpeciesRun.growth_rate,
+                )
+                .where(DSpeciesRun.run_id.in_(chunk))
+                .order_by(DSpeciesRun.run_id, DSpeciesRun.species_index)
+            )
+            for run_id, initial_population, growth_rate in sess.execute(q).all():
+                species.setdefault(run_id, []).append((initial_population, growth_rate))
+
+    populations = {}
+    for run_id, sparse in coefficients.items():
+        initial_populations, growth_rates = np.array(species[run_id]).T
+        populations[run_id] = SimulationPopulations(
+            initial_populations, growth_rates, sparse.to_dense(), sparse
+        )
+    return populations
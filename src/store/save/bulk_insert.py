@@ -0,0 +1,122 @@
+import csv
+import io
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import JSON, LargeBinary, Table
+from sqlalchemy.dialects.postgresql import insert as postgres_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from store.dbase import Base
+from util.json_utils import json_dumps
+
+
+def bulk_insert(
+    sess: Session, table: Table, columns: List[str], rows: Iterable[Sequence]
+) -> None:
+    """
+    Inserts plain rows without building an ORM object for each, in the session's
+    transaction. Postgres streams them with COPY, anything else uses one executemany
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    connection = sess.connection()
+    if connection.dialect.driver == "psycopg2":
+        _copy_rows(connection.connection.dbapi_connection, table, columns, rows)
+        return
+    connection.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def _copy_rows(
+    dbapi_connection, table: Table, columns: List[str], rows: List[Sequence]
+):
+    buffer = io.StringIO()
+    column_types = [table.columns[column].type for column in columns]
+    writer = csv.writer(buffer)
+    writer.writerows(
+        [_copy_value(type_, value) for type_, value in zip(column_types, row)]
+        for row in rows
+    )
+    buffer.seek(0)
+    column_list = ", ".join(columns)
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+
+def _copy_value(column_type, value):
+    """A value as COPY reads it, the way the column's type would bind it for an insert"""
+    if value is None:
+        return None
+    if isinstance(column_type, JSON):
+        return json_dumps(value)
+    if isinstance(column_type, LargeBinary):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, float):
+        # repr keeps every digit of a float, so COPY saves the same values as an insert
+        return repr(value)
+    return value
+
+
+class ColumnBuffer:
+    """
+    The rows of one table as a list for each column, so the rows of many trials can be
+    collected a column at a time and only zipped into rows when they are inserted
+    """
+
+    table: Table
+    columns: Dict[str, list]
+
+    def __init__(self, table: Table, columns: Dict[str, Sequence]) -> None:
+        self.table = table
+        self.columns = {name: list(values) for name, values in columns.items()}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), []))
+
+    def extend(self, other: "ColumnBuffer") -> None:
+        """Appends the rows of 'other', which has the same table and columns"""
+        for name, values in self.columns.items():
+            values.extend(other.columns[name])
+
+    def insert(self, sess: Session) -> None:
+        bulk_insert(sess, self.table, list(self.columns), zip(*self.columns.values()))
+
+
+def insert_all(sess: Session, buffers: List[ColumnBuffer]) -> None:
+    """Inserts every buffer in order, in the session's transaction"""
+    for buffer in buffers:
+        buffer.insert(sess)
+
+
+def entity_columns(entities: List[Base]) -> List[ColumnBuffer]:
+    """
+    The rows of ORM objects that were never added to a session, grouped by table in the
+    order each table first appears. Every column has to be set, defaults aren't applied
+    """
+    by_table: Dict[Table, List[Base]] = {}
+    for entity in entities:
+        by_table.setdefault(entity.__table__, []).append(entity)
+    return [
+        ColumnBuffer(
+            table,
+            {
+                column.name: [getattr(entity, column.key) for entity in group]
+                for column in table.columns
+            },
+        )
+        for table, group in by_table.items()
+    ]
+
+
+def insert_ignoring_conflicts(
+    sess: Session, entity, rows: List[dict], index_elements: List[str]
+) -> None:
+    """Inserts the rows that don't conflict on 'index_elements', as one statement"""
+    if sess.get_bind().dialect.name == "postgresql":
+        insert = postgres_insert(entity)
+    else:
+        insert = sqlite_insert(entity)
+    sess.execute(insert.on_conflict_do_nothing(index_elements=index_elements), rows)
@@ -0,0 +1,209 @@
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+from store.dbase import db
+from store.save.bulk_insert import ColumnBuffer, insert_all
+
+type TrialColumns = List[ColumnBuffer]
+"""Every row saved for a trial, by table in insert order"""
+
+
+class ResultSinkStats:
+    trials: int
+    rows: int
+    flushes: int
+    timed_flushes: int
+    """How many flushes were made because the oldest trial waited 'flush_seconds'"""
+    max_batch: int
+    """The most trials saved by one flush"""
+    flush_seconds: float
+    """Total time spent inserting and committing"""
+    max_flush_seconds: float
+    failed: int
+    """How many trials couldn't be saved, even on their own"""
+    blocked: int
+    """How many adds had to wait for earlier trials to be saved"""
+    wait_seconds: float
+    """Total time simulation threads spent waiting to add"""
+
+    def __init__(self) -> None:
+        self.trials = 0
+        self.rows = 0
+        self.flushes = 0
+        self.timed_flushes = 0
+        self.max_batch = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.failed = 0
+        self.blocked = 0
+        self.wait_seconds = 0.0
+
+    def __str__(self) -> str:
+        flushes = max(self.flushes, 1)
+        throughput = self.trials / self.flush_seconds if self.flush_seconds else 0.0
+        return (
+            f"saved {self.trials} trials ({self.rows} rows) in {self.flushes} flushes, "
+            + f"{self.timed_flushes} of them timed, "
+            + f"{round(self.trials / flushes, 1)} trials per flush "
+            + f"(at most {self.max_batch}), "
+            + f"{round(self.flush_seconds / flushes, 3)}s per flush "
+            + f"(longest {round(self.max_flush_seconds, 3)}s), "
+            + f"{round(throughput, 1)} trials/s while flushing, "
+            + f"{self.failed} failed, "
+            + f"{self.blocked} waited {round(self.wait_seconds, 3)}s in total"
+        )
+
+
+class ResultSink:
+    """
+    Collects the rows of many trials into a buffer for each table, then inserts them all
+    in one transaction once 'flush_trials' trials are buffered or the oldest of them has
+    waited 'flush_seconds'. The future of each trial is done once it's committed.
+
+    Adding blocks while 'max_pending' trials are buffered or being flushed, so
+    simulation can't run arbitrarily far ahead of the database. A batch that fails is
+    saved one trial at a time instead, so only the failing trial is lost
+    """
+
+    flush_trials: int
+    flush_seconds: float
+    max_pending: int
+    stats: ResultSinkStats
+    buffers: Dict[str, ColumnBuffer]
+    """The rows of every buffered trial by table name, in insert order"""
+    batch: List[Tuple[Future, TrialColumns]]
+    """The buffered trials, kept to be saved on their own if the batch fails"""
+    first_added: float
+    """When the oldest buffered trial was added"""
+    pending: int
+    """How many trials are buffered or being flushed"""
+
+    def __init__(self, flush_trials: int, flush_seconds: float, max_pending: int):
+        # Trials blocked on a full sink would otherwise wait for the timer
+        self.flush_trials = max(min(flush_trials, max_pending), 1)
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.stats = ResultSinkStats()
+        self.condition = Condition()
+        self.buffers = {}
+        self.batch = []
+        self.first_added = 0.0
+        self.pending = 0
+        self.flush_requested = False
+        self.is_closed = False
+        # Started by the first trial, so processes that never save don't run one
+        self.flusher: Thread | None = None
+
+    def add(self, columns: TrialColumns) -> Future:
+        """Buffers the rows of a trial, returning a future done once they're saved"""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        stats = self.stats
+        with self.condition:
+            if self.is_closed:
+                raise RuntimeError("Trial added to a result sink after its shutdown")
+            if self.pending >= self.max_pending:
+                start = perf_counter()
+                self.condition.wait_for(lambda: self.pending < self.max_pending)
+                stats.blocked += 1
+                stats.wait_seconds += perf_counter() - start
+            if self.flusher is None:
+                self.flusher = Thread(target=self._flush_loop, daemon=True)
+                self.flusher.start()
+
+            if not self.batch:
+                self.first_added = perf_counter()
+            for buffer in columns:
+                name = buffer.table.name
+                if name in self.buffers:
+                    self.buffers[name].extend(buffer)
+                else:
+                    self.buffers[name] = ColumnBuffer(buffer.table, buffer.columns)
+            self.batch.append((future, columns))
+            self.pending += 1
+            self.condition.notify_all()
+        return future
+
+    def flush(self) -> None:
+        """Saves what is buffered without waiting for more trials, and without blocking"""
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+
+    def _next_batch(
+        self,
+    ) -> Tuple[List[Tuple[Future, TrialColumns]], Dict[str, ColumnBuffer], bool] | None:
+        """
+        Waits until the buffered trials are due to be flushed, then takes them along with
+        whether it was their time that was up. None once shut down with nothing left
+        """
+        with self.condition:
+            while True:
+                if not self.batch:
+                    self.flush_requested = False
+                    if self.is_closed:
+                        return None
+                    self.condition.wait()
+                    continue
+                remaining = self.first_added + self.flush_seconds - perf_counter()
+                is_full = len(self.batch) >= self.flush_trials
+                if is_full or self.flush_requested or remaining <= 0:
+                    batch, buffers = self.batch, self.buffers
+                    self.batch, self.buffers = [], {}
+                    self.flush_requested = False
+                    return batch, buffers, not is_full and remaining <= 0
+                self.condition.wait(remaining)
+
+    def _flush_loop(self) -> None:
+        while (next_batch := self._next_batch()) is not None:
+            batch, buffers, is_timed = next_batch
+            start = perf_counter()
+            try:
+                with db.sess() as sess:
+                    insert_all(sess, list(buffers.values()))
+                    sess.commit()
+            except Exception:
+                errors = [self._save_alone(columns) for _, columns in batch]
+            else:
+                errors = [None] * len(batch)
+            duration = perf_counter() - start
+
+            with self.condition:
+                stats = self.stats
+                stats.flushes += 1
+                stats.timed_flushes += is_timed
+                stats.trials += len(batch)
+                stats.rows += sum(len(buffer) for buffer in buffers.values())
+                stats.failed += sum(error is not None for error in errors)
+                stats.max_batch = max(stats.max_batch, len(batch))
+                stats.flush_seconds += duration
+                stats.max_flush_seconds = max(stats.max_flush_seconds, duration)
+            # Outside the lock, as their callbacks may add more trials
+            for (future, _), error in zip(batch, errors):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+            with self.condition:
+                self.pending -= len(batch)
+                self.condition.notify_all()
+
+    def _save_alone(self, columns: TrialColumns) -> Exception | None:
+        try:
+            with db.sess() as sess:
+                insert_all(sess, columns)
+                sess.commit()
+        except Exception as e:
+            return e
+        return None
+
+    def shutdown(self) -> None:
+        """Saves every trial still buffered, then stops the flushing thread"""
+        with self.condition:
+            self.is_closed = True
+            self.flush_requested = True
+            self.condition.notify_all()
+        if self.flusher is not None:
+            self.flusher.join()
@@ -0,0 +1,189 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Condition, Lock
+from time import perf_counter
+from typing import Callable, List, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from model.simulation_trial import SimulationSurvival, SimulationTrial
+from store.dbase import db
+
+type SaveFn = Callable[..., None]
+"""Adds a trial to the session it is given as the first argument, without committing"""
+
+
+def pending_trial_bytes(trial: SimulationTrial, survival: SimulationSurvival) -> int:
+    """
+    The arrays a trial's rows are built from, as an estimate of the memory the rows
+    hold while they wait to be saved. Networks are shared by the trials of a series,
+    so this overestimates the memory of a series queued together
+    """
+    populations = trial.populations
+    arrays = [
+        populations.initial_populations,
+        populations.growth_rates,
+        *populations.built_coefficients(),
+        survival.alive_generations,
+        survival.final_populations,
+    ]
+    return sum(np.asarray(array).nbytes for array in arrays)
+
+
+class SaveQueueStats:
+    submitted: int
+    pending: int
+    pending_bytes: int
+    max_pending: int
+    """The most trials that were ever waiting to be saved at once"""
+    blocked: int
+    """How many submits had to wait for earlier trials to be saved"""
+    wait_seconds: float
+    """Total time simulation threads spent waiting to submit"""
+    max_wait_seconds: float
+    commits: int
+    """How many transactions the trials were saved in"""
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.pending = 0
+        self.pending_bytes = 0
+        self.max_pending = 0
+        self.blocked = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.commits = 0
+
+    def __str__(self) -> str:
+        return (
+            f"saved {self.submitted} trials in {self.commits} commits, "
+            + f"at most {self.max_pending} pending, "
+            + f"{self.blocked} waited {round(self.wait_seconds, 3)}s in total "
+            + f"(longest {round(self.max_wait_seconds, 3)}s)"
+        )
+
+
+class SaveQueue:
+    """
+    Saves trials on a pool of writer threads. Once 'max_pending' trials or 'max_bytes'
+    of their arrays are waiting to be saved, submitting blocks until one is saved, so
+    simulation can't run arbitrarily far ahead of the database.
+    A single trial larger than 'max_bytes' is still let through when nothing is pending.
+
+    With 'group_commit', one writer saves every trial waiting in a single transaction,
+    for databases such as SQLite that only allow one writer at a time
+    """
+
+    max_pending: int
+    max_bytes: int
+    group_commit: bool
+    stats: SaveQueueStats
+    waiting: List[Tuple[Future, SaveFn, tuple]]
+    """Trials waiting for the group commit writer"""
+
+    def __init__(
+        self, writers: int, max_pending: int, max_bytes: int, group_commit: bool
+    ) -> None:
+        self.group_commit = group_commit
+        if group_commit:
+            writers = 1
+        self.executor = ThreadPoolExecutor(max_workers=writers)
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.stats = SaveQueueStats()
+        self.condition = Condition()
+        self.waiting = []
+        self.is_draining = False
+        self.waiting_lock = Lock()
+
+    def _is_full(self, nbytes: int) -> bool:
+        stats = self.stats
+        if stats.pending == 0:
+            return False
+        return (
+            stats.pending >= self.max_pending
+            or stats.pending_bytes + nbytes > self.max_bytes
+        )
+
+    def submit(self, nbytes: int, fn: SaveFn, *args) -> Future:
+        """Queues fn(session, *args) to be saved, holding on to 'nbytes' until it is done"""
+        stats = self.stats
+        with self.condition:
+            if self._is_full(nbytes):
+                start = perf_counter()
+                self.condition.wait_for(lambda: not self._is_full(nbytes))
+                waited = perf_counter() - start
+                stats.blocked += 1
+                stats.wait_seconds += waited
+                stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            stats.submitted += 1
+            stats.pending += 1
+            stats.pending_bytes += nbytes
+            stats.max_pending = max(stats.max_pending, stats.pending)
+
+        try:
+            if self.group_commit:
+                future = self._submit_to_group(fn, args)
+            else:
+                future = self.executor.submit(self._save, fn, args)
+        except Exception:
+            self._on_saved(nbytes)
+            raise
+        future.add_done_callback(lambda _: self._on_saved(nbytes))
+        return future
+
+    def _save(self, fn: SaveFn, args: tuple) -> None:
+        with db.sess() as sess:
+            fn(sess, *args)
+            self._commit(sess)
+
+    def _commit(self, sess: Session) -> None:
+        sess.commit()
+        with self.condition:
+            self.stats.commits += 1
+
+    def _submit_to_group(self, fn: SaveFn, args: tuple) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self.waiting_lock:
+            self.waiting.append((future, fn, args))
+            if not self.is_draining:
+                self.is_draining = True
+                self.executor.submit(self._drain)
+        return future
+
+    def _drain(self) -> None:
+        """Saves whatever is waiting as one transaction, until nothing is left"""
+        while True:
+            with self.waiting_lock:
+                batch = self.waiting
+                self.waiting = []
+                if not batch:
+                    self.is_draining = False
+                    return
+            try:
+                with db.sess() as sess:
+                    for _, fn, args in batch:
+                        fn(sess, *args)
+                    self._commit(sess)
+            except Exception:
+                # Saved one at a time instead, so only the failing trial is lost
+                for future, fn, args in batch:
+                    try:
+                        self._save(fn, args)
+                    except Exception as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(None)
+                continue
+            for future, _, _ in batch:
+                future.set_result(None)
+
+    def _on_saved(self, nbytes: int) -> None:
+        with self.condition:
+            self.stats.pending -= 1
+            self.stats.pending_bytes -= nbytes
+            self.condition.notify_all()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
@@ -1,56 +1,98 @@
+from datetime import datetime, timezone
+from typing import Dict, List
+from uuid import UUID
+
 import numpy as np
 
-from model.simulation_cpu import GENERATIONS_DTYPE
-from model.simulation_trial import Generations, SimulationTrial
-from store.dbase import db
+from env.program_env import program_env
+from model.simulation_trial import (
+    GENERATIONS_DTYPE,
+    SimulationSurvival,
+    SimulationTrial,
+)
 from store.entity.dcoefficients import DCoefficients
+from store.entity.dcoefficients_blob import DCoefficientsBlob, pack_coefficients
 from store.entity.dparameters import DParameters
-from store.entity.drun import DRun
+from store.entity.drun import DRun, generate_run_id
 from store.entity.dspecies_run import DSpeciesRun
+from store.save.bulk_insert import ColumnBuffer, entity_columns
+
 
+def create_run(trial: SimulationTrial, dparameters: DParameters) -> DRun:
+    """
+    A run with every column already set, so it can be analyzed before it is saved, and
+    saved without the ORM
+    """
+    drun = DRun(trial, dparameters)
+    drun.id = generate_run_id()
+    drun.parameters_id = dparameters.id
+    # What func.now() would have given in SQLite, as the row isn't inserted right away
+    drun.run_date = datetime.now(timezone.utc).replace(tzinfo=None)
+    return drun
 
-def save_trial(
-    dparameters: DParameters, trial: SimulationTrial, generations: Generations
-) -> DRun:
-    survival_days = np.where(generations != -1, generations, 0)
-    survival_days = np.count_nonzero(survival_days, axis=1).astype(GENERATIONS_DTYPE)
+
+def trial_columns(
+    drun: DRun, trial: SimulationTrial, survival: SimulationSurvival
+) -> List[ColumnBuffer]:
+    """The rows of the run, its species and their coefficients, in insert order"""
+    survival_days = survival.alive_generations.astype(GENERATIONS_DTYPE)
     survival_days *= trial.accuracy.euler_step
 
-    with db.sess() as sess:
-        populations = trial.populations
-        coefficients = populations.coefficients
-        spec_count = len(populations.initial_populations)
-
-        sess.add(dparameters)
-        drun: DRun = DRun(trial, dparameters)
-        sess.add(drun)
-        sess.commit()
-
-        all_species = []
-        for species_id in range(spec_count):
-            initial_population = populations.initial_populations[species_id]
-            growth_rate = populations.growth_rates[species_id]
-            species = DSpeciesRun(
-                drun,
-                species_id,
-                growth_rate,
-                initial_population,
-                survival_days[species_id],
+    populations = trial.populations
+    coefficients = np.asarray(populations.coefficients)
+    spec_count = len(populations.initial_populations)
+
+    # The same ids DSpeciesRun gives each species of the run
+    first_id = int.from_bytes(drun.id.bytes)
+    species_ids = [
+        UUID(int=first_id + species, version=4) for species in range(spec_count)
+    ]
+    species = ColumnBuffer(
+        DSpeciesRun.__table__,
+        {
+            "id": species_ids,
+            "species_index": range(spec_count),
+            "run_id": [drun.id] * spec_count,
+            "growth_rate": np.asarray(
+                populations.growth_rates, dtype=np.float64
+            ).tolist(),
+            "initial_population": np.asarray(
+                populations.initial_populations, dtype=np.float64
+            ).tolist(),
+            "days_survived": survival_days.tolist(),
+        },
+    )
+    # The species rows reference the run
+    columns = entity_columns([drun]) + [species]
+
+    if program_env.run.coefficient_layout == "blob":
+        sparse = populations.get_sparse_coefficients()
+        blob = DCoefficientsBlob(
+            run_id=drun.id,
+            species_count=spec_count,
+            edge_count=sparse.edge_count(),
+            coefficients=pack_coefficients(sparse),
+        )
+        columns += entity_columns([blob])
+    else:
+        columns.append(
+            ColumnBuffer(
+                DCoefficients.__table__,
+                _coefficient_columns(coefficients, species_ids),
             )
-            sess.add(species)
-            all_species.append(species)
-        sess.commit()
-
-        for source in range(spec_count - 1):
-            for target in range(source + 1, spec_count):
-                s_to_t = coefficients[source][target]
-                t_to_s = coefficients[target][source]
-                if t_to_s == 0 and s_to_t == 0:
-                    continue
-
-                coeff = DCoefficients(
-                    all_species[source], all_species[target], s_to_t, t_to_s
-                )
-                sess.add(coeff)
-        sess.commit()
-    return drun
+        )
+    return columns
+
+
+def _coefficient_columns(
+    coefficients: np.ndarray, species_ids: List[UUID]
+) -> Dict[str, list]:
+    """Each pair of species once, if either affects the other"""
+    is_edge = np.logical_or(coefficients != 0, coefficients.T != 0)
+    sources, targets = np.nonzero(np.triu(is_edge, k=1))
+    return {
+        "source_id": [species_ids[source] for source in sources],
+        "target_id": [species_ids[target] for target in targets],
+        "source_to_target": coefficients[sources, targets].tolist(),
+        "target_to_source": coefficients[targets, sources].tolist(),
+    }
@@ -0,0 +1,31 @@
+from concurrent.futures import Future
+from threading import Lock
+from typing import Callable, List
+
+
+def when_all_done(
+    futures: List[Future], fn: Callable[[BaseException | None], None]
+) -> None:
+    """
+    Calls fn once every future is done, with the first exception any of them raised.
+    Called by the thread finishing the last future, or right away if they all are done
+    """
+    remaining = len(futures)
+    errors: List[BaseException] = []
+    lock = Lock()
+
+    def on_done(future: Future) -> None:
+        nonlocal remaining
+        with lock:
+            if future.exception() is not None:
+                errors.append(future.exception())
+            remaining -= 1
+            is_last = remaining == 0
+        if is_last:
+            fn(errors[0] if errors else None)
+
+    if not futures:
+        fn(None)
+        return
+    for future in futures:
+        future.add_done_callback(on_done)
@@ -0,0 +1,25 @@
+from itertools import tee
+from threading import Lock
+from typing import Iterable, Iterator, Tuple
+
+
+class _LockedIterator[T]:
+    def __init__(self, iterator: Iterator[T], lock: Lock) -> None:
+        self.iterator = iterator
+        self.lock = lock
+
+    def __iter__(self) -> Iterator[T]:
+        return self
+
+    def __next__(self) -> T:
+        with self.lock:
+            return next(self.iterator)
+
+
+def locked_tee[T](iterable: Iterable[T], n: int = 2) -> Tuple[Iterator[T], ...]:
+    """
+    Like itertools.tee, but each copy can be advanced from a different thread.
+    The source is only iterated once, so its side effects happen once
+    """
+    lock = Lock()
+    return tuple(_LockedIterator(it, lock) for it in tee(iterable, n))
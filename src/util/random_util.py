@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from random import Random
 
+import numpy as np
+
 
 def random_int(random: Random, a: int | None = None, b: int | None = None):
     if a is None and b is None:
@@ -17,6 +19,47 @@ def random_float(random: Random, a: float, b: float):
     return random.random() * (upper - lower) + lower
 
 
+class StreamRandom(Random):
+    """
+    A Random that draws from a numpy Generator instead of its own Mersenne Twister.
+    Floats are drawn from the generator in blocks, so scalar calls stay cheap, and
+    'generator' can be sampled directly for arrays
+    """
+
+    BLOCK_SIZE = 256
+
+    generator: np.random.Generator
+
+    def __init__(self, generator: np.random.Generator) -> None:
+        # Seeded with a constant, as the Mersenne Twister is never drawn from
+        super().__init__(0)
+        self.generator = generator
+        self._block = []
+        self._position = 0
+
+    def random(self) -> float:
+        if self._position == len(self._block):
+            self._block = self.generator.random(self.BLOCK_SIZE).tolist()
+            self._position = 0
+        value = self._block[self._position]
+        self._position += 1
+        return value
+
+    def getrandbits(self, k: int) -> int:
+        byte_count = (k + 7) // 8
+        bits = int.from_bytes(self.generator.bytes(byte_count), "little")
+        return bits >> (byte_count * 8 - k)
+
+    def getstate(self) -> tuple:
+        bit_state = self.generator.bit_generator.state
+        return (bit_state, list(self._block), self._position, self.gauss_next)
+
+    def setstate(self, state: tuple) -> None:
+        bit_state, block, self._position, self.gauss_next = state
+        self.generator.bit_generator.state = bit_state
+        self._block = list(block)
+
+
 class RandomMeshVariables(ABC):
     @abstractmethod
     def gen_count(self) -> int:
@@ -2,8 +2,31 @@ from random import Random
 from typing import List
 from uuid import UUID
 
+import numpy as np
+
 from util.hashing import hash_digest
 
+LEGACY_RANDOM_ALGORITHM = 1
+"""Each series gets a Random seeded from a SHA3 digest of the master seed and series"""
+STREAM_RANDOM_ALGORITHM = 2
+"""
+Each network of a series and each purpose gets its own Philox stream, keyed by the
+master seed
+"""
+
+NETWORKS_STREAM = 0
+ACCURACY_STREAM = 1
+
+
+def network_stream(network: int, purpose: int) -> int:
+    """
+    One stream counter for both the network of a series and the purpose, as a stream is
+    only identified by 3 counters
+    """
+    if not 0 <= network < 2**32 or not 0 <= purpose < 2**32:
+        raise ValueError(f"Network {network} or purpose {purpose} out of range")
+    return network << 32 | purpose
+
 
 class Seed:
     uuid: UUID
@@ -20,3 +43,17 @@ class Seed:
 
         seed = Random(digest).randbytes(16)
         return Random(seed)
+
+    def generate_stream(self, *counters: int) -> np.random.Generator:
+        """
+        An independent stream identified by up to 3 counters, such as the epoch,
+        iteration and network_stream(network, purpose). The master seed is the Philox key, and the counters are
+        the high words of its counter, so each stream has 2^64 blocks before another.
+        Streams are the same in every process, and can be skipped ahead with jumped()
+        """
+        if len(counters) > 3:
+            raise ValueError(f"At most 3 counters identify a stream, not {counters}")
+        key = np.frombuffer(self.uuid.bytes, dtype="<u8")
+        counter = np.zeros(4, dtype=np.uint64)
+        counter[1 : 1 + len(counters)] = counters
+        return np.random.Generator(np.random.Philox(counter=counter, key=key))
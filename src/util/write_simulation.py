@@ -1,8 +1,10 @@
 from os import makedirs, path
+from typing import BinaryIO
 
 import numpy as np
 
-from model.simulation_trial import Generations
+from model.simulation_recorder import GenerationsSink
+from model.simulation_trial import GENERATIONS_DTYPE, Generations
 
 
 def write_meta(growth_rates, coefficients, solname: str):
@@ -87,17 +89,46 @@ def write_edges_csv(coefficients, file):
 
 
 def write_generations(simulation: Generations, filename: str):
-    parent = path.dirname(filename)
-    if not path.exists(parent):
-        makedirs(parent)
-
-    with open(filename, "wb") as file:
-        last_alive: np.ndarray[int] = np.count_nonzero(simulation, axis=1)
-        species_count = len(last_alive)
-
-        file.write(last_alive.tobytes())
-        for sp in range(species_count):
-            file.write(simulation[sp, :].tobytes())
+    species_count, rounded_iterations = simulation.shape
+    writer = GenerationsFileWriter(filename, species_count, rounded_iterations)
+    writer.write_block(0, simulation)
+    writer.close()
+
+
+class GenerationsFileWriter(GenerationsSink):
+    """
+    Writes the same file as write_generations one block of time at a time.
+    Each species is still written as one contiguous row, by seeking to where the block
+    goes in that row, and the header is written once every block has been counted.
+    """
+
+    file: BinaryIO
+    last_alive: np.ndarray[int]
+    rounded_iterations: int
+
+    def __init__(self, filename: str, species_count: int, rounded_iterations: int):
+        parent = path.dirname(filename)
+        if not path.exists(parent):
+            makedirs(parent)
+
+        self.file = open(filename, "wb")
+        self.last_alive = np.zeros(species_count, dtype=np.intp)
+        self.rounded_iterations = rounded_iterations
+
+    def write_block(self, generation_t: int, block: Generations) -> None:
+        self.last_alive += np.count_nonzero(block, axis=1)
+
+        item_size = np.dtype(GENERATIONS_DTYPE).itemsize
+        row_size = self.rounded_iterations * item_size
+        header_size = self.last_alive.nbytes
+        for sp in range(len(block)):
+            self.file.seek(header_size + sp * row_size + generation_t * item_size)
+            self.file.write(block[sp, :].astype(GENERATIONS_DTYPE).tobytes())
+
+    def close(self) -> None:
+        self.file.seek(0)
+        self.file.write(self.last_alive.tobytes())
+        self.file.close()
 
 
 def write_readable_generations_csv(simulation: Generations, filename: str):